@@ -0,0 +1,62 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+from direct.actor.Actor import Actor
+
+from StartupTrace import NULL_SPAN
+
+# One Actor kept aside for each kind of model, from which the
+# Actors that we actually use are copied.
+#
+# Building an Actor from file-names has it look up its model and
+# each of its animations--resolving the names, searching the
+# model-pool, and setting up an animation-definition for each. Copying
+# an existing Actor skips all of that: the copy gets its own geometry
+# and joints--so that it can be posed independently of the others--but
+# shares the template's loaded animation-bundles.
+#
+# (Instancing the template would be cheaper still, but then every
+# enemy would share the same joints, and so the same pose.)
+class ActorTemplates():
+    # Building a template is recorded in the given StartupTrace,
+    # if any, as Actors load through a loader that it can't watch
+    def __init__(self, assetCache, trace = None):
+        self.assetCache = assetCache
+        self.trace = trace
+
+        # Keyed by model-name; each model is expected
+        # to always be used with the same animations
+        self.templates = {}
+
+    def getTemplate(self, modelName, modelAnims):
+        template = self.templates.get(modelName, None)
+        if template is None:
+            if self.trace is not None:
+                span = self.trace.span("actor", modelName)
+            else:
+                span = NULL_SPAN
+            with span:
+                template = Actor(self.assetCache.resolve(modelName),
+                                 self.assetCache.resolveAnims(modelAnims))
+                # Load and bind the animations now, so that the
+                # copies are handed the loaded bundles
+                template.bindAllAnims()
+            self.templates[modelName] = template
+        return template
+
+    def makeActor(self, modelName, modelAnims):
+        return Actor(other = self.getTemplate(modelName, modelAnims))
+
+    def cleanup(self):
+        for template in self.templates.values():
+            template.cleanup()
+            template.removeNode()
+        self.templates = {}
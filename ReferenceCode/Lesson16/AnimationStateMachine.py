@@ -0,0 +1,95 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+# Keeps track of which animation an Actor is playing.
+#
+# The Actor's AnimControls are looked up once, when the machine
+# is made, and the current state is tracked here--so the Actor
+# is only touched when the state actually changes.
+#
+# Anything interested in those changes can add a listener, which
+# is called with the previous state and the new one.
+class AnimationStateMachine():
+    def __init__(self, actor):
+        self.controls = {}
+        self.durations = {}
+        for animName in actor.getAnimNames():
+            control = actor.getAnimControl(animName)
+            if control is not None:
+                self.controls[animName] = control
+                self.durations[animName] = control.getNumFrames()/control.getFrameRate()
+
+        self.state = None
+        self.currentControl = None
+        self.looping = False
+
+        self.listeners = []
+
+    def addListener(self, listener):
+        self.listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def getDuration(self, stateName):
+        return self.durations.get(stateName, None)
+
+    # Looping states carry on until something else is requested;
+    # others play once. Asking for the looping state that we're
+    # already in does nothing, while asking for a one-off state
+    # that we're already in starts it again.
+    def request(self, stateName, loop = True):
+        if stateName == self.state and loop and self.looping:
+            return
+
+        control = self.controls.get(stateName, None)
+        if control is None:
+            return
+
+        if self.currentControl is not None and self.currentControl is not control:
+            self.currentControl.stop()
+
+        if loop:
+            control.loop(True)
+        else:
+            control.play()
+
+        previousState = self.state
+        self.state = stateName
+        self.currentControl = control
+        self.looping = loop
+
+        for listener in self.listeners:
+            listener(previousState, stateName)
+
+    # Whether we're in the given state, and its
+    # animation hasn't yet run out
+    def isPlaying(self, stateName):
+        return self.state == stateName and self.currentControl.isPlaying()
+
+    def stop(self):
+        if self.currentControl is not None:
+            self.currentControl.stop()
+
+        previousState = self.state
+        self.state = None
+        self.currentControl = None
+        self.looping = False
+
+        if previousState is not None:
+            for listener in self.listeners:
+                listener(previousState, None)
+
+    def cleanup(self):
+        self.listeners = []
+        self.controls = {}
+        self.currentControl = None
@@ -0,0 +1,118 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+import math
+
+# Keeps objects inside the arena.
+#
+# The arena is an axis-aligned square, so rather than having the
+# pusher test each object against the walls, we simply clamp the
+# objects' positions to lie within them, allowing for the walls'
+# thickness and the objects' own radii.
+#
+# When an object first comes up against a wall, we report
+# it to the given ContactDispatcher.
+class ArenaBounds():
+    def __init__(self, world, minX, minY, maxX, maxY, wallRadius, contacts):
+        self.world = world
+        self.contacts = contacts
+
+        self.minX = minX + wallRadius
+        self.minY = minY + wallRadius
+        self.maxX = maxX - wallRadius
+        self.maxY = maxY - wallRadius
+
+        self.members = []
+
+        # The members that were against a wall when last we checked
+        self.touching = set()
+
+    def add(self, obj):
+        self.members.append(obj)
+
+    def remove(self, obj):
+        if obj in self.members:
+            self.members.remove(obj)
+        self.touching.discard(obj)
+
+    def clear(self):
+        self.members = []
+        self.touching = set()
+
+    # How far a ray starting at (x, y) and heading along the
+    # unit-vector (dirX, dirY) goes before it meets a wall
+    def getExitDistance(self, x, y, dirX, dirY):
+        distance = math.inf
+        if dirX > 0:
+            distance = min(distance, (self.maxX - x)/dirX)
+        elif dirX < 0:
+            distance = min(distance, (self.minX - x)/dirX)
+        if dirY > 0:
+            distance = min(distance, (self.maxY - y)/dirY)
+        elif dirY < 0:
+            distance = min(distance, (self.minY - y)/dirY)
+
+        if distance == math.inf:
+            return 0
+        return max(distance, 0)
+
+    def update(self):
+        transforms = self.world.transforms
+        xs = transforms.columns["x"]
+        ys = transforms.columns["y"]
+        zs = transforms.columns["z"]
+        nodePaths = transforms.columns["nodePath"]
+        mirrors = transforms.columns["mirror"]
+        transformIndices = transforms.indices
+
+        for obj in self.members:
+            t = transformIndices[obj.entity]
+            x = xs[t]
+            y = ys[t]
+            radius = obj.colliderRadius
+
+            hitX = False
+            hitY = False
+            if x < self.minX + radius:
+                x = self.minX + radius
+                hitX = True
+            elif x > self.maxX - radius:
+                x = self.maxX - radius
+                hitX = True
+            if y < self.minY + radius:
+                y = self.minY + radius
+                hitY = True
+            elif y > self.maxY - radius:
+                y = self.maxY - radius
+                hitY = True
+
+            if not (hitX or hitY):
+                self.touching.discard(obj)
+                continue
+
+            xs[t] = x
+            ys[t] = y
+            nodePaths[t].setPos(x, y, zs[t])
+            mirror = mirrors[t]
+            if mirror is not None:
+                mirror.set(x, y, zs[t])
+
+            # Stop any movement into the wall
+            vx, vy = obj.getVelocity()
+            if hitX:
+                vx = 0
+            if hitY:
+                vy = 0
+            obj.setVelocity(vx, vy)
+
+            if obj not in self.touching:
+                self.touching.add(obj)
+                self.contacts.reportWallContact(obj)
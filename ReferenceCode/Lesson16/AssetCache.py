@@ -0,0 +1,282 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+# A cache of our models and animations in binary (.bam) form.
+#
+# When the game is packaged, "build_apps" converts our .egg-files to
+# .bam-files. While developing, however, every model is loaded from
+# its .egg-file--which is text, and thus slow to parse.
+#
+# So, when a model is asked for, we look for its .egg-file, and if we
+# have a .bam-file made from the same contents--as told by a hash of
+# them--we hand back that instead. If we don't, we make one. Should
+# the .egg-file change, its hash changes, and the old .bam-file is
+# thrown away.
+#
+# A .bam-file written by one version of Panda may not load in an
+# older one, so the version that wrote each file is part of its
+# name, too; switching versions likewise has the files re-made.
+#
+# To save re-hashing every file on every run, the hash of each
+# file is noted alongside its size and modification-time; the
+# file is only hashed again if one of those has changed.
+#
+# Converting a model means parsing its .egg-file, which is slow;
+# to keep that off the main thread, a model can instead be loaded
+# in the background--see "prepare" and "store", used by the
+# Preloader--and the .bam-file made from the result.
+#
+# Run this file to convert a whole folder up front:
+#
+#   python AssetCache.py Models
+
+from panda3d.core import Filename, NodePath, Loader, LoaderOptions, ModelPool, PandaSystem
+
+import os, sys, json, time, hashlib, argparse
+
+MAIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EGG_EXTENSIONS = (".egg", ".egg.pz")
+
+PANDA_VERSION = PandaSystem.getVersionString()
+
+def hashFile(path):
+    hasher = hashlib.sha1()
+    with open(path, "rb") as sourceFile:
+        for block in iter(lambda: sourceFile.read(65536), b""):
+            hasher.update(block)
+    return hasher.hexdigest()[:16]
+
+class AssetCache():
+    def __init__(self, cacheDir = "assetCache", enabled = True):
+        if not os.path.isabs(cacheDir):
+            cacheDir = os.path.join(MAIN_DIR, cacheDir)
+        self.cacheDir = cacheDir
+        self.enabled = enabled
+
+        self.manifestPath = os.path.join(cacheDir, "manifest.json")
+        self.manifest = {}
+        if enabled and os.path.exists(self.manifestPath):
+            try:
+                with open(self.manifestPath) as manifestFile:
+                    self.manifest = json.load(manifestFile)
+            except (OSError, ValueError):
+                self.manifest = {}
+
+        # What each model-name resolved to in this run
+        self.resolved = {}
+
+        self.loaderOptions = LoaderOptions(LoaderOptions.LF_search | LoaderOptions.LF_report_errors)
+
+    # Finds the .egg-file for the given model-name, if there is one
+    def findSource(self, modelName):
+        for extension in ("",) + EGG_EXTENSIONS:
+            candidate = modelName + extension
+            if candidate.endswith(EGG_EXTENSIONS):
+                path = os.path.join(MAIN_DIR, candidate)
+                if os.path.isfile(path):
+                    return candidate, path
+        return None, None
+
+    # Returns the name to load the given model by: that of a cached
+    # .bam-file, if we can have one, or otherwise the name as given
+    def resolve(self, modelName):
+        if not self.enabled:
+            return modelName
+
+        result = self.resolved.get(modelName, None)
+        if result is None:
+            result = modelName
+            sourceName, sourcePath = self.findSource(modelName)
+            if sourcePath is not None:
+                bamPath = self.getBam(sourceName, sourcePath)
+                if bamPath is not None:
+                    result = Filename.fromOsSpecific(bamPath).getFullpath()
+            self.resolved[modelName] = result
+
+        return result
+
+    # As "resolve", but without converting anything. Returns the
+    # name to load the given model by, and whether that's its
+    # .egg-file--in which case, once loaded, the model should
+    # be handed to "store" to be converted
+    def prepare(self, modelName):
+        if not self.enabled:
+            return modelName, False
+
+        result = self.resolved.get(modelName, None)
+        if result is not None:
+            return result, False
+
+        sourceName, sourcePath = self.findSource(modelName)
+        if sourcePath is None:
+            self.resolved[modelName] = modelName
+            return modelName, False
+
+        # Only a cheap check is made here; anything doubtful is
+        # left to "store", once the model has been loaded
+        stat = os.stat(sourcePath)
+        entry = self.manifest.get(sourceName, None)
+        if self.isEntryCurrent(entry, stat):
+            bamPath = self.getBamPath(sourceName, entry["hash"])
+            if os.path.exists(bamPath):
+                result = Filename.fromOsSpecific(bamPath).getFullpath()
+                self.resolved[modelName] = result
+                return result, False
+
+        return sourceName, True
+
+    # Writes a .bam-file for a model that was loaded from its .egg-file,
+    # as "prepare" called for. The model is also put in the model-pool
+    # under the .bam-file's name, so that "resolve"-ing and loading it
+    # later on gets it from memory, rather than from disk.
+    def store(self, modelName, model):
+        sourceName, sourcePath = self.findSource(modelName)
+        if sourcePath is None:
+            return
+
+        bamPath = self.getBam(sourceName, sourcePath, model)
+        if bamPath is None:
+            self.resolved[modelName] = modelName
+            return
+
+        result = Filename.fromOsSpecific(bamPath).getFullpath()
+        self.resolved[modelName] = result
+        ModelPool.addModel(Filename(result), model.node())
+
+    # As "resolve", for a dictionary of animation-names and files
+    def resolveAnims(self, anims):
+        return {animName : self.resolve(animFile) for animName, animFile in anims.items()}
+
+    # Whether the given manifest-entry still describes the source-file
+    # with the given stats, and was converted by this version of Panda
+    def isEntryCurrent(self, entry, stat):
+        return (entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime and
+                entry.get("panda", None) == PANDA_VERSION)
+
+    # Entries from before versions were noted have no version;
+    # their files are named without one
+    def getBamPath(self, sourceName, sourceHash, pandaVersion = PANDA_VERSION):
+        stem = sourceName
+        for extension in EGG_EXTENSIONS:
+            if stem.endswith(extension):
+                stem = stem[:-len(extension)]
+                break
+        if pandaVersion is None:
+            return os.path.join(self.cacheDir, stem + "-" + sourceHash + ".bam")
+        return os.path.join(self.cacheDir, stem + "-" + sourceHash + "-p" + pandaVersion + ".bam")
+
+    # Returns the path of an up-to-date .bam-file made from the
+    # given .egg-file, converting it--or the given model, if it's
+    # already been loaded--if called for; None is returned if the
+    # conversion failed
+    def getBam(self, sourceName, sourcePath, model = None):
+        stat = os.stat(sourcePath)
+        entry = self.manifest.get(sourceName, None)
+
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            sourceHash = entry["hash"]
+        else:
+            sourceHash = hashFile(sourcePath)
+
+        bamPath = self.getBamPath(sourceName, sourceHash)
+
+        if entry is not None and (entry["hash"] != sourceHash or entry.get("panda", None) != PANDA_VERSION):
+            # The source or Panda has changed, so the old conversion is stale
+            oldPath = self.getBamPath(sourceName, entry["hash"], entry.get("panda", None))
+            if os.path.exists(oldPath):
+                os.remove(oldPath)
+
+        if not os.path.exists(bamPath):
+            if not self.convert(sourcePath, bamPath, model):
+                return None
+
+        newEntry = {"size" : stat.st_size, "mtime" : stat.st_mtime, "hash" : sourceHash, "panda" : PANDA_VERSION}
+        if entry != newEntry:
+            self.manifest[sourceName] = newEntry
+            self.saveManifest()
+
+        return bamPath
+
+    def convert(self, sourcePath, bamPath, model = None):
+        if model is None:
+            node = Loader.getGlobalPtr().loadSync(Filename.fromOsSpecific(sourcePath), self.loaderOptions)
+            if node is None:
+                return False
+            model = NodePath(node)
+
+        os.makedirs(os.path.dirname(bamPath), exist_ok = True)
+        return model.writeBamFile(Filename.fromOsSpecific(bamPath))
+
+    def saveManifest(self):
+        os.makedirs(self.cacheDir, exist_ok = True)
+        tempPath = self.manifestPath + ".tmp"
+        with open(tempPath, "w") as manifestFile:
+            json.dump(self.manifest, manifestFile, indent = 1, sort_keys = True)
+        os.replace(tempPath, self.manifestPath)
+
+    def clear(self):
+        if os.path.isdir(self.cacheDir):
+            for dirPath, dirNames, fileNames in os.walk(self.cacheDir):
+                for fileName in fileNames:
+                    if fileName.endswith(".bam") or fileName == "manifest.json":
+                        os.remove(os.path.join(dirPath, fileName))
+        self.manifest = {}
+        self.resolved = {}
+
+    # Converts every .egg-file under the given folder
+    def prewarm(self, folder, report = None):
+        results = []
+        for dirPath, dirNames, fileNames in os.walk(os.path.join(MAIN_DIR, folder)):
+            dirNames.sort()
+            for fileName in sorted(fileNames):
+                if not fileName.endswith(EGG_EXTENSIONS):
+                    continue
+                sourcePath = os.path.join(dirPath, fileName)
+                sourceName = os.path.relpath(sourcePath, MAIN_DIR).replace(os.sep, "/")
+
+                startTime = time.perf_counter()
+                bamPath = self.getBam(sourceName, sourcePath)
+                duration = time.perf_counter() - startTime
+
+                results.append((sourceName, bamPath is not None, duration))
+                if report is not None:
+                    report(sourceName, bamPath is not None, duration)
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description = "Convert the game's .egg-files to cached .bam-files")
+    parser.add_argument("folders", nargs = "*", default = ["Models"],
+                        help = "folders to convert, relative to the game's folder")
+    parser.add_argument("--cache-dir", default = "assetCache")
+    parser.add_argument("--clear", action = "store_true",
+                        help = "throw away the existing cache first")
+    args = parser.parse_args()
+
+    cache = AssetCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+
+    def report(sourceName, succeeded, duration):
+        status = "ok" if succeeded else "FAILED"
+        print("{0:<60}{1:>8}{2:>10.1f} ms".format(sourceName, status, duration*1000.0))
+
+    failures = 0
+    for folder in args.folders:
+        for sourceName, succeeded, duration in cache.prewarm(folder, report):
+            if not succeeded:
+                failures += 1
+
+    if failures > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+# Runs scripted, headless scenarios of the game and reports
+# how well it kept up. For example:
+#
+#   python Benchmark.py chase --enemies 20,50,100 --duration 30
+#
+# Giving several values for "--enemies" or "--traps" runs each
+# combination in its own process--Panda only allows one
+# ShowBase per process--and reports them together.
+#
+# The "footprint" scenario doesn't run the game at all; instead it
+# compares each kind of game-object with a copy of it as it was before
+# it used slots--the same classes, methods and properties, but with
+# an instance-dictionary--both in the memory taken per instance and
+# in the time taken to read and write its attributes.
+#
+# Nor does the "spawn" scenario; it times the building of each kind
+# of Actor, first from file-names--as the game used to--and then by
+# copying a template, as it does now (see ActorTemplates.py).
+
+from panda3d.core import loadPrcFileData, Point3
+
+import sys, time, json, argparse, subprocess, tracemalloc, timeit
+
+# "resource" isn't available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SCENARIOS = ("chase", "traps", "laser", "churn", "footprint", "spawn")
+
+# In the "laser" scenario, where the player aims when there are
+# no enemies about: along one of the lanes that they come in by
+LASER_IDLE_TARGET = Point3(7.0, 1.9, 0)
+
+# The Actors built in the "spawn" scenario
+SPAWN_ACTORS = (
+    ("WalkingEnemy", "Models/Misc/simpleEnemy", {
+        "stand" : "Models/Misc/simpleEnemy-stand",
+        "walk" : "Models/Misc/simpleEnemy-walk",
+        "attack" : "Models/Misc/simpleEnemy-attack",
+        "die" : "Models/Misc/simpleEnemy-die",
+        "spawn" : "Models/Misc/simpleEnemy-spawn"
+    }),
+    ("TrapEnemy", "Models/Misc/trap", {
+        "stand" : "Models/Misc/trap-stand",
+        "walk" : "Models/Misc/trap-walk"
+    })
+)
+
+def getPeakRssMb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports this in kilobytes, macOS in bytes
+    if sys.platform == "darwin":
+        return peak/(1024.0*1024.0)
+    return peak/1024.0
+
+def runScenario(scenario, numEnemies, numTraps, duration, numCycles):
+    # Imported here so that the configuration above takes
+    # effect before the game reads it
+    from Game import Game
+
+    class BenchmarkGame(Game):
+        def __init__(self):
+            self.results = None
+            self.numCycles = 0
+
+            self.scenarioSteps = {
+                "chase" : self.stepChase,
+                "traps" : self.stepTraps,
+                "laser" : self.stepLaser,
+                "churn" : self.stepChurn
+            }
+
+            Game.__init__(self)
+
+        def startGame(self):
+            Game.startGame(self)
+
+            # The usual spawning and difficulty-ramp are
+            # replaced by the scenario's own
+            self.maxEnemies = numEnemies
+            self.spawnTimer = 1000000000
+            self.difficultyTimer = 1000000000
+
+            if scenario == "laser":
+                self.keyMap["shoot"] = True
+
+        def tick(self, dt):
+            if self.player is not None and self.results is None:
+                self.scenarioSteps[scenario]()
+            Game.tick(self, dt)
+
+            # The player shouldn't die, so whatever damage it
+            # took is undone before the game checks for that
+            if self.player is not None:
+                self.player.health = self.player.maxHealth
+
+        def readInput(self):
+            keys, aimPoint = Game.readInput(self)
+            if scenario == "laser":
+                aimPoint = self.getLaserTarget()
+            return keys, aimPoint
+
+        # The nearest enemy, so that the laser spends its time
+        # hitting things, rather than the far wall
+        def getLaserTarget(self):
+            playerPos = self.player.position
+            target = LASER_IDLE_TARGET
+            bestDistanceSquared = None
+            for enemy in self.enemies:
+                distanceSquared = (enemy.position - playerPos).lengthSquared()
+                if bestDistanceSquared is None or distanceSquared < bestDistanceSquared:
+                    target = enemy.position
+                    bestDistanceSquared = distanceSquared
+            return target
+
+        def topUpEnemies(self):
+            while len(self.enemies) < self.maxEnemies:
+                self.spawnEnemy()
+
+        def stepChase(self):
+            self.topUpEnemies()
+
+        def stepLaser(self):
+            self.topUpEnemies()
+
+        def stepTraps(self):
+            self.topUpEnemies()
+
+            # Keep every trap sliding, so that the load grows with
+            # the number of traps; each is set off just as the
+            # game's TrapLanes would set it off
+            for trap in self.trapEnemies:
+                if trap.moveDirection == 0:
+                    trap.startMoving(self.player)
+
+        def stepChurn(self):
+            if self.numCycles >= numCycles:
+                self.finishSimulation()
+                return
+
+            self.topUpEnemies()
+            for enemy in self.enemies:
+                enemy.alterHealth(-enemy.maxHealth)
+                self.numCycles += 1
+
+        def startEnemyDeath(self, enemy):
+            if scenario == "churn":
+                # Enemies are killed as soon as they spawn, far faster
+                # than their death-animations play out; were we to wait
+                # for those, the pool would run dry, and we'd measure the
+                # building of new enemies, rather than the churn itself
+                self.enemyPool.release(enemy)
+                return
+            Game.startEnemyDeath(self, enemy)
+
+        def finishSimulation(self):
+            if self.results is not None:
+                return
+
+            frameReport = self.profiler.getPhaseReport("frame")
+            results = self.getSimulationStats()
+            results.update({
+                "scenario" : scenario,
+                "enemies" : numEnemies,
+                "trapsPerSide" : numTraps,
+                "cycles" : self.numCycles,
+                "meanFrameMs" : frameReport["meanMs"],
+                "p95FrameMs" : frameReport["p95Ms"],
+                "p99FrameMs" : frameReport["p99Ms"],
+                "peakRssMb" : getPeakRssMb(),
+                "phases" : self.profiler.getReport()["phases"]
+            })
+            self.results = results
+
+            taskMgr.stop()
+
+    if scenario == "churn":
+        # This runs until it's done enough cycles, however long that takes
+        duration = 0
+
+    loadPrcFileData("benchmark", "\n".join([
+        "game-headless #t",
+        "game-sim-duration {0}".format(duration),
+        "game-max-enemies {0}".format(numEnemies),
+        "game-traps-per-side {0}".format(numTraps),
+        "game-profile #t",
+        "game-profile-window 1000000"
+    ]))
+
+    game = BenchmarkGame()
+    game.run()
+
+    return game.results
+
+def getSlotNames(cls):
+    names = []
+    for klass in reversed(cls.__mro__):
+        names += klass.__dict__.get("__slots__", ())
+    return names
+
+# The memory taken by "count" instances of the given class, in bytes
+# per instance, with every attribute filled in. The actual objects
+# that the attributes refer to aren't counted, as they're the same
+# either way.
+def measureInstances(cls, attributeNames, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    instances = []
+    for i in range(count):
+        instance = cls.__new__(cls)
+        for name in attributeNames:
+            setattr(instance, name, None)
+        instances.append(instance)
+
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return (after - before)/count
+
+# A copy of the given class--and of the classes that it derives
+# from--as it was before it used slots: the same methods and
+# properties, but without "__slots__", and thus with an
+# instance-dictionary and room for weak references
+def makeDictClass(cls, copies):
+    if cls is object:
+        return object
+    if cls in copies:
+        return copies[cls]
+
+    slotNames = cls.__dict__.get("__slots__", ())
+    skippedNames = set(slotNames) | {"__slots__", "__dict__", "__weakref__", "__init_subclass__"}
+    namespace = {name : value for name, value in cls.__dict__.items() if name not in skippedNames}
+
+    bases = tuple(makeDictClass(base, copies) for base in cls.__bases__)
+    copy = type(cls.__name__, bases, namespace)
+    copies[cls] = copy
+    return copy
+
+# The mean time taken to read and to write one of the given
+# attributes of an instance of the given class, in nanoseconds.
+# The accesses are written out in full, as they would be in
+# "update" or "runLogic", so that the loop doesn't swamp them.
+def timeAttributeAccess(cls, attributeNames, repeats):
+    instance = cls.__new__(cls)
+    for name in attributeNames:
+        setattr(instance, name, 0)
+
+    namespace = {}
+    exec("def readAll(obj):\n" + "".join("    obj.{0}\n".format(name) for name in attributeNames) +
+         "def writeAll(obj):\n" + "".join("    obj.{0} = 0\n".format(name) for name in attributeNames),
+         namespace)
+    readAll = namespace["readAll"]
+    writeAll = namespace["writeAll"]
+
+    numAccesses = repeats*len(attributeNames)
+    readTime = min(timeit.repeat(lambda: readAll(instance), number = repeats, repeat = 5))
+    writeTime = min(timeit.repeat(lambda: writeAll(instance), number = repeats, repeat = 5))
+    return readTime*1000000000.0/numAccesses, writeTime*1000000000.0/numAccesses
+
+def runFootprint(count, repeats):
+    from GameObject import Player, WalkingEnemy, TrapEnemy
+
+    copies = {}
+    resultList = []
+    for cls in (WalkingEnemy, TrapEnemy, Player):
+        attributeNames = getSlotNames(cls)
+        dictClass = makeDictClass(cls, copies)
+
+        dictBytes = measureInstances(dictClass, attributeNames, count)
+        slotsBytes = measureInstances(cls, attributeNames, count)
+        dictReadNs, dictWriteNs = timeAttributeAccess(dictClass, attributeNames, repeats)
+        slotsReadNs, slotsWriteNs = timeAttributeAccess(cls, attributeNames, repeats)
+
+        resultList.append({
+            "class" : cls.__name__,
+            "attributes" : len(attributeNames),
+            "dictBytes" : dictBytes,
+            "slotsBytes" : slotsBytes,
+            "savedBytes" : dictBytes - slotsBytes,
+            "dictReadNs" : dictReadNs,
+            "slotsReadNs" : slotsReadNs,
+            "dictWriteNs" : dictWriteNs,
+            "slotsWriteNs" : slotsWriteNs
+        })
+    return resultList
+
+def printFootprint(resultList):
+    print("{0:<14}{1:>7}{2:>8}{3:>8}{4:>8}{5:>10}{6:>10}{7:>10}{8:>10}".format("class", "attrs",
+                                                                            "dict B", "slots B", "saved B",
+                                                                            "dict rd", "slots rd",
+                                                                            "dict wr", "slots wr"))
+    for results in resultList:
+        print("{class:<14}{attributes:>7}{dictBytes:>8.0f}{slotsBytes:>8.0f}{savedBytes:>8.0f}"
+              "{dictReadNs:>10.1f}{slotsReadNs:>10.1f}{dictWriteNs:>10.1f}{slotsWriteNs:>10.1f}".format(**results))
+    print("(bytes per instance; nanoseconds per attribute read or write)")
+
+# The mean time taken to build an Actor with the given function,
+# and start it animating, in microseconds per Actor
+def timeSpawns(makeActor, count):
+    actors = []
+    startTime = time.perf_counter()
+    for i in range(count):
+        actor = makeActor()
+        actor.reparentTo(render)
+        actor.loop("walk")
+        actors.append(actor)
+    duration = time.perf_counter() - startTime
+
+    for actor in actors:
+        actor.cleanup()
+        actor.removeNode()
+
+    return duration*1000000.0/count
+
+def runSpawn(count):
+    loadPrcFileData("benchmark", "window-type none\naudio-library-name null")
+
+    from direct.showbase.ShowBase import ShowBase
+    from direct.actor.Actor import Actor
+    from AssetCache import AssetCache
+    from ActorTemplates import ActorTemplates
+
+    showBase = ShowBase()
+    assetCache = AssetCache()
+    templates = ActorTemplates(assetCache)
+
+    resultList = []
+    for name, modelName, modelAnims in SPAWN_ACTORS:
+        def makeFromFiles():
+            return Actor(assetCache.resolve(modelName),
+                         assetCache.resolveAnims(modelAnims))
+
+        def makeFromTemplate():
+            return templates.makeActor(modelName, modelAnims)
+
+        # Build one of each first, so that neither pays for
+        # loading the files from disk
+        timeSpawns(makeFromFiles, 1)
+        templates.getTemplate(modelName, modelAnims)
+
+        filesMicroseconds = timeSpawns(makeFromFiles, count)
+        templateMicroseconds = timeSpawns(makeFromTemplate, count)
+        resultList.append({
+            "actor" : name,
+            "count" : count,
+            "filesMicroseconds" : filesMicroseconds,
+            "templateMicroseconds" : templateMicroseconds,
+            "speedup" : filesMicroseconds/templateMicroseconds
+        })
+
+    templates.cleanup()
+    showBase.destroy()
+
+    return resultList
+
+def printSpawn(resultList):
+    print("{0:<14}{1:>8}{2:>14}{3:>14}{4:>10}".format("actor", "count", "files us", "template us", "speedup"))
+    for results in resultList:
+        print("{actor:<14}{count:>8}{filesMicroseconds:>14.1f}{templateMicroseconds:>14.1f}{speedup:>10.2f}".format(**results))
+
+def printResults(resultList):
+    print("{0:<8}{1:>8}{2:>7}{3:>10}{4:>10}{5:>10}{6:>12}{7:>10}".format("scenario", "enemies", "traps",
+                                                                         "mean ms", "p95 ms", "p99 ms",
+                                                                         "ticks/s", "RSS MB"))
+    for results in resultList:
+        peakRss = results["peakRssMb"]
+        if peakRss is None:
+            peakRss = float("nan")
+        print("{scenario:<8}{enemies:>8}{trapsPerSide:>7}{meanFrameMs:>10.3f}{p95FrameMs:>10.3f}{p99FrameMs:>10.3f}{ticksPerSecond:>12.0f}{0:>10.1f}".format(peakRss, **results))
+
+def parseCounts(text):
+    return [int(value) for value in text.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark scenarios for Panda-chan and the Endless Horde")
+    parser.add_argument("scenario", choices = SCENARIOS)
+    parser.add_argument("--enemies", default = "20",
+                        help = "the number of walking enemies; a comma-separated list runs each")
+    parser.add_argument("--traps", default = "2",
+                        help = "the number of traps per side; a comma-separated list runs each")
+    parser.add_argument("--duration", type = float, default = 20.0,
+                        help = "seconds of play to simulate")
+    parser.add_argument("--cycles", type = int, default = 1000,
+                        help = "spawn/death cycles to run in the \"churn\" scenario")
+    parser.add_argument("--spawns", type = int, default = 200,
+                        help = "Actors of each kind to build in the \"spawn\" scenario")
+    parser.add_argument("--tick-rate", type = float, default = 60.0)
+    parser.add_argument("--batched-steering", action = "store_true")
+    parser.add_argument("--json", metavar = "FILE",
+                        help = "write the results as JSON to FILE (\"-\" for standard output)")
+    args = parser.parse_args()
+
+    loadPrcFileData("benchmark", "game-tick-rate {0}".format(args.tick_rate))
+    if args.batched_steering:
+        from HordeSteering import HordeSteering
+        if not HordeSteering.isAvailable():
+            parser.error("--batched-steering requires NumPy; install it with \"pip install numpy\"")
+        loadPrcFileData("benchmark", "game-batched-steering #t")
+
+    if args.scenario in ("footprint", "spawn"):
+        if args.scenario == "footprint":
+            resultList = runFootprint(1000, 200000)
+            printList = printFootprint
+        else:
+            resultList = runSpawn(args.spawns)
+            printList = printSpawn
+        if args.json == "-":
+            print(json.dumps(resultList))
+        else:
+            if args.json is not None:
+                with open(args.json, "w") as outputFile:
+                    json.dump(resultList, outputFile, indent = 2)
+            printList(resultList)
+        return
+
+    enemyCounts = parseCounts(args.enemies)
+    trapCounts = parseCounts(args.traps)
+
+    if len(enemyCounts) == 1 and len(trapCounts) == 1:
+        resultList = [runScenario(args.scenario, enemyCounts[0], trapCounts[0],
+                                  args.duration, args.cycles)]
+    else:
+        resultList = []
+        for numEnemies in enemyCounts:
+            for numTraps in trapCounts:
+                command = [sys.executable, __file__, args.scenario,
+                           "--enemies", str(numEnemies),
+                           "--traps", str(numTraps),
+                           "--duration", str(args.duration),
+                           "--cycles", str(args.cycles),
+                           "--tick-rate", str(args.tick_rate),
+                           "--json", "-"]
+                if args.batched_steering:
+                    command.append("--batched-steering")
+                output = subprocess.run(command, stdout = subprocess.PIPE,
+                                        universal_newlines = True, check = True).stdout
+                resultList.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json == "-":
+        print(json.dumps(resultList if len(resultList) > 1 else resultList[0]))
+    else:
+        if args.json is not None:
+            with open(args.json, "w") as outputFile:
+                json.dump(resultList, outputFile, indent = 2)
+        printResults(resultList)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+# The sorts of thing that can come into contact. Each game-object
+# class names its own in "contactCategory"; walls have no object.
+CONTACT_PLAYER = 0
+CONTACT_WALKING_ENEMY = 1
+CONTACT_TRAP_ENEMY = 2
+CONTACT_WALL = 3
+
+NUM_CONTACT_CATEGORIES = 4
+
+# Hands contacts between objects straight to the functions
+# that deal with them.
+#
+# Handlers are kept in a table indexed by the categories of the
+# two objects--the one that moved into the other ("from") and the
+# one that it moved into ("into")--and are called with the objects
+# themselves. Much like the pusher's "in"-events, a handler is only
+# called when two objects first touch, not for as long as they do.
+class ContactDispatcher():
+    def __init__(self):
+        self.handlers = [[None]*NUM_CONTACT_CATEGORIES for i in range(NUM_CONTACT_CATEGORIES)]
+
+        # The pairs that were touching as of the last tick,
+        # and those that have been found to be touching in this one
+        self.previousContacts = set()
+        self.currentContacts = set()
+
+    def addHandler(self, fromCategory, intoCategory, handler):
+        self.handlers[fromCategory][intoCategory] = handler
+
+    def removeHandler(self, fromCategory, intoCategory):
+        self.handlers[fromCategory][intoCategory] = None
+
+    # Notes that the two objects are touching, and if they
+    # weren't before, calls the handler for them
+    def reportContact(self, fromObj, intoObj):
+        pair = (fromObj, intoObj)
+        if pair in self.currentContacts:
+            return
+        self.currentContacts.add(pair)
+
+        if pair not in self.previousContacts:
+            handler = self.handlers[fromObj.contactCategory][intoObj.contactCategory]
+            if handler is not None:
+                handler(fromObj, intoObj)
+
+    # Walls keep track of their own contacts, so this just
+    # calls the handler
+    def reportWallContact(self, fromObj):
+        handler = self.handlers[fromObj.contactCategory][CONTACT_WALL]
+        if handler is not None:
+            handler(fromObj, None)
+
+    # Reports everything that the given objects overlap, according to
+    # the spatial hash, as matched against their "from" masks.
+    #
+    # As with the swept movement, a mover only counts as touching
+    # something if it's heading towards it; otherwise, something that
+    # came to rest against another object would be stopped by it
+    # again as soon as it tried to move away.
+    def findContacts(self, movers, spatialHash):
+        for mover in movers:
+            pos = mover.position
+            velocityX, velocityY = mover.getVelocity()
+            for obj in spatialHash.query(pos.x, pos.y, mover.colliderRadius, mover.fromMask):
+                if obj is mover:
+                    continue
+                objPos = obj.position
+                if (objPos.x - pos.x)*velocityX + (objPos.y - pos.y)*velocityY <= 0:
+                    continue
+                self.reportContact(mover, obj)
+
+    # Called once all of a tick's contacts have been reported
+    def endTick(self):
+        self.previousContacts = self.currentContacts
+        self.currentContacts = set()
+
+    def clear(self):
+        self.previousContacts = set()
+        self.currentContacts = set()
@@ -0,0 +1,381 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+from array import array
+
+import math
+
+# A simple entity-component-system.
+#
+# An entity is just a number. Its data is held in component-stores,
+# each of which keeps one packed array per field, with the entities
+# that have that component at the front. Systems then run over those
+# arrays in bulk, rather than each object updating itself.
+#
+# This is a data-layer, with only the systems below: friction,
+# movement, swept movement and health. The game-objects in
+# GameObject.py each own an entity, and keep their behaviour--how
+# the player responds to keys, how enemies chase, how traps slide--in
+# their classes, as before; only the data that those systems run over
+# lives here.
+
+class ComponentStore():
+    # "fields" maps each numeric field to an array type-code and
+    # a default value; "objectFields" names fields that hold
+    # Python objects, such as NodePaths
+    def __init__(self, name, fields, objectFields = ()):
+        self.name = name
+
+        self.defaults = {}
+        self.columns = {}
+        for fieldName, (typeCode, default) in fields.items():
+            self.columns[fieldName] = array(typeCode)
+            self.defaults[fieldName] = default
+        for fieldName in objectFields:
+            self.columns[fieldName] = []
+            self.defaults[fieldName] = None
+
+        # The entity held at each index, and the index of each entity
+        self.entities = []
+        self.indices = {}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def has(self, entity):
+        return entity in self.indices
+
+    def add(self, entity, **values):
+        self.indices[entity] = len(self.entities)
+        self.entities.append(entity)
+        for fieldName, column in self.columns.items():
+            column.append(values.get(fieldName, self.defaults[fieldName]))
+
+    def remove(self, entity):
+        index = self.indices.pop(entity)
+        last = len(self.entities) - 1
+
+        # Keep things packed by moving the last entry into the gap
+        if index != last:
+            movedEntity = self.entities[last]
+            self.entities[index] = movedEntity
+            self.indices[movedEntity] = index
+            for column in self.columns.values():
+                column[index] = column[last]
+
+        self.entities.pop()
+        for column in self.columns.values():
+            column.pop()
+
+    def get(self, entity, fieldName):
+        return self.columns[fieldName][self.indices[entity]]
+
+    def set(self, entity, fieldName, value):
+        self.columns[fieldName][self.indices[entity]] = value
+
+class World():
+    def __init__(self):
+        self.freeEntities = []
+
+        # The object--if any--that speaks for each entity,
+        # indexed by entity
+        self.owners = []
+
+        self.transforms = ComponentStore("Transform",
+                                         {
+                                             "x" : ("d", 0.0),
+                                             "y" : ("d", 0.0),
+                                             "z" : ("d", 0.0),
+                                             "heading" : ("d", 0.0)
+                                         },
+                                         ("nodePath", "mirror"))
+        self.velocities = ComponentStore("Velocity",
+                                         {
+                                             "x" : ("d", 0.0),
+                                             "y" : ("d", 0.0),
+                                             "maxSpeed" : ("d", 0.0),
+                                             "walking" : ("b", 0),
+                                             "enabled" : ("b", 1),
+                                             # Whether something other than
+                                             # us--the pusher--might move it
+                                             "pushed" : ("b", 0),
+                                             # Whether it's moved by the
+                                             # SweptMovementSystem, below
+                                             "swept" : ("b", 0)
+                                         })
+        self.healths = ComponentStore("Health",
+                                      {
+                                          "health" : ("d", 0.0),
+                                          "maxHealth" : ("d", 0.0),
+                                          "alive" : ("b", 1)
+                                      })
+        self.colliders = ComponentStore("Collider",
+                                        {
+                                            "radius" : ("d", 0.0),
+                                            "intoMask" : ("L", 0),
+                                            "fromMask" : ("L", 0),
+                                            # What stops a swept entity; see
+                                            # the SweptMovementSystem, below
+                                            "blockMask" : ("L", 0)
+                                        })
+        self.scoreValues = ComponentStore("ScoreValue",
+                                          {
+                                              "value" : ("l", 0)
+                                          })
+
+        self.stores = [self.transforms, self.velocities, self.healths,
+                       self.colliders, self.scoreValues]
+
+    def createEntity(self, owner = None):
+        if len(self.freeEntities) > 0:
+            entity = self.freeEntities.pop()
+        else:
+            entity = len(self.owners)
+            self.owners.append(None)
+        self.owners[entity] = owner
+        return entity
+
+    def destroyEntity(self, entity):
+        for store in self.stores:
+            if store.has(entity):
+                store.remove(entity)
+        self.owners[entity] = None
+        self.freeEntities.append(entity)
+
+    def getOwner(self, entity):
+        return self.owners[entity]
+
+# Clamps each entity's speed, and slows those that aren't
+# walking, much as GameObject.update once did for each object
+class FrictionSystem():
+    def __init__(self, world, friction):
+        self.world = world
+        self.friction = friction
+
+    def update(self, dt):
+        velocities = self.world.velocities
+        xs = velocities.columns["x"]
+        ys = velocities.columns["y"]
+        maxSpeeds = velocities.columns["maxSpeed"]
+        walking = velocities.columns["walking"]
+        enabled = velocities.columns["enabled"]
+
+        frictionVal = self.friction*dt
+
+        for index in range(len(velocities)):
+            if not enabled[index]:
+                continue
+
+            vx = xs[index]
+            vy = ys[index]
+            speed = math.sqrt(vx*vx + vy*vy)
+
+            scale = 1.0
+            maxSpeed = maxSpeeds[index]
+            if speed > maxSpeed:
+                scale = maxSpeed/speed
+                speed = maxSpeed
+
+            if not walking[index]:
+                if frictionVal > speed:
+                    scale = 0
+                else:
+                    scale *= 1.0 - frictionVal/speed
+
+            if scale != 1.0:
+                xs[index] = vx*scale
+                ys[index] = vy*scale
+
+# Moves each entity by its velocity, and then hands the
+# result on to its NodePath
+class MovementSystem():
+    def __init__(self, world):
+        self.world = world
+
+    def update(self, dt):
+        velocities = self.world.velocities
+        transforms = self.world.transforms
+
+        vxs = velocities.columns["x"]
+        vys = velocities.columns["y"]
+        enabled = velocities.columns["enabled"]
+        pushed = velocities.columns["pushed"]
+        swept = velocities.columns["swept"]
+
+        xs = transforms.columns["x"]
+        ys = transforms.columns["y"]
+        zs = transforms.columns["z"]
+        nodePaths = transforms.columns["nodePath"]
+        mirrors = transforms.columns["mirror"]
+        transformIndices = transforms.indices
+
+        for index, entity in enumerate(velocities.entities):
+            if not enabled[index] or swept[index]:
+                continue
+
+            t = transformIndices[entity]
+            nodePath = nodePaths[t]
+
+            if pushed[index]:
+                # The pusher may have moved this one since we last did
+                pos = nodePath.getPos()
+                xs[t] = pos.x
+                ys[t] = pos.y
+                zs[t] = pos.z
+
+            x = xs[t] + vxs[index]*dt
+            y = ys[t] + vys[index]*dt
+            xs[t] = x
+            ys[t] = y
+
+            nodePath.setPos(x, y, zs[t])
+
+            mirror = mirrors[t]
+            if mirror is not None:
+                mirror.set(x, y, zs[t])
+
+# Moves fast entities--those marked as "swept"--by sweeping their
+# colliders along their movement, so that they can't skip past
+# something in a single long step.
+#
+# The sweep is checked against the spatial hash, so this should be
+# run once that's up to date; each entity is re-filed in the hash as
+# it moves, so that those that move after it see where it is now.
+#
+# Should an entity run into something that its "block" mask matches,
+# it's stopped where it touches it. Anything else that its "from"
+# mask matches, it passes over. Either way, the listeners are called
+# with the owners of the two.
+class SweptMovementSystem():
+    def __init__(self, world, spatialHash):
+        self.world = world
+        self.spatialHash = spatialHash
+
+        self.listeners = []
+
+    def addListener(self, listener):
+        self.listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def update(self, dt):
+        velocities = self.world.velocities
+        transforms = self.world.transforms
+        colliders = self.world.colliders
+        owners = self.world.owners
+
+        vxs = velocities.columns["x"]
+        vys = velocities.columns["y"]
+        enabled = velocities.columns["enabled"]
+        pushed = velocities.columns["pushed"]
+        swept = velocities.columns["swept"]
+
+        xs = transforms.columns["x"]
+        ys = transforms.columns["y"]
+        zs = transforms.columns["z"]
+        nodePaths = transforms.columns["nodePath"]
+        mirrors = transforms.columns["mirror"]
+        transformIndices = transforms.indices
+
+        radii = colliders.columns["radius"]
+        fromMasks = colliders.columns["fromMask"]
+        blockMasks = colliders.columns["blockMask"]
+        colliderIndices = colliders.indices
+
+        spatialHash = self.spatialHash
+
+        contacts = []
+
+        for index, entity in enumerate(velocities.entities):
+            if not enabled[index] or not swept[index]:
+                continue
+
+            t = transformIndices[entity]
+            nodePath = nodePaths[t]
+
+            if pushed[index]:
+                pos = nodePath.getPos()
+                xs[t] = pos.x
+                ys[t] = pos.y
+                zs[t] = pos.z
+
+            dx = vxs[index]*dt
+            dy = vys[index]*dt
+            if dx == 0 and dy == 0:
+                continue
+
+            startX = xs[t]
+            startY = ys[t]
+
+            owner = owners[entity]
+            c = colliderIndices.get(entity, None)
+            if c is not None:
+                radius = radii[c]
+                blockMask = blockMasks[c]
+                hitObject, fraction = spatialHash.sweepCircle(startX, startY,
+                                                              startX + dx, startY + dy,
+                                                              radius, blockMask, owner)
+                if hitObject is not None:
+                    dx *= fraction
+                    dy *= fraction
+
+                passMask = fromMasks[c] & ~blockMask
+                if passMask != 0:
+                    for obj in spatialHash.touchCircle(startX, startY,
+                                                       startX + dx, startY + dy,
+                                                       radius, passMask, owner):
+                        contacts.append((owner, obj))
+
+                if hitObject is not None:
+                    contacts.append((owner, hitObject))
+
+            x = startX + dx
+            y = startY + dy
+            xs[t] = x
+            ys[t] = y
+
+            nodePath.setPos(x, y, zs[t])
+
+            mirror = mirrors[t]
+            if mirror is not None:
+                mirror.set(x, y, zs[t])
+
+            if owner is not None:
+                spatialHash.update(owner, x, y)
+
+        # The listeners are only told once everything has moved,
+        # in case they change things
+        for mover, hitObject in contacts:
+            for listener in self.listeners:
+                listener(mover, hitObject)
+
+# Finds the entities whose health has run out since we last checked
+class HealthSystem():
+    def __init__(self, world):
+        self.world = world
+
+    def collectDeaths(self):
+        healths = self.world.healths
+        values = healths.columns["health"]
+        alive = healths.columns["alive"]
+
+        owners = self.world.owners
+        newlyDead = []
+        for index, entity in enumerate(healths.entities):
+            if alive[index] and values[index] <= 0:
+                alive[index] = 0
+                owner = owners[entity]
+                if owner is None:
+                    owner = entity
+                newlyDead.append(owner)
+        return newlyDead
@@ -0,0 +1,45 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+from panda3d.core import Vec3
+
+class EnemyPool():
+    def __init__(self, enemyType):
+        self.enemyType = enemyType
+
+        # Enemies that have been constructed, but that aren't
+        # currently in play
+        self.freeEnemies = []
+
+    def reserve(self, count):
+        # Build enemies up-front, so that spawning them later
+        # doesn't involve loading any models or sounds
+        while len(self.freeEnemies) < count:
+            enemy = self.enemyType(Vec3(0, 0, 0))
+            enemy.deactivate()
+            self.freeEnemies.append(enemy)
+
+    def acquire(self, pos):
+        if len(self.freeEnemies) > 0:
+            enemy = self.freeEnemies.pop()
+            enemy.activate(pos)
+        else:
+            enemy = self.enemyType(pos)
+        return enemy
+
+    def release(self, enemy):
+        enemy.deactivate()
+        self.freeEnemies.append(enemy)
+
+    def cleanup(self):
+        for enemy in self.freeEnemies:
+            enemy.cleanup()
+        self.freeEnemies = []
@@ -0,0 +1,128 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+from collections import deque
+
+import time, json
+
+# The upper edges, in milliseconds, of the histogram's buckets;
+# anything slower than the last lands in a final overflow-bucket
+HISTOGRAM_EDGES = [0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.7, 33.3, 66.7]
+
+def percentile(sortedSamples, fraction):
+    if len(sortedSamples) == 0:
+        return 0
+    index = int(round(fraction*(len(sortedSamples) - 1)))
+    return sortedSamples[index]
+
+# Records how long each phase of a frame takes, keeping
+# the most recent "windowSize" samples for each.
+#
+# Timing is done by "marks": each call to "mark" records the time
+# since the previous mark (or call to "startPhase") under the
+# given name.
+class FrameProfiler():
+    def __init__(self, windowSize = 600):
+        self.windowSize = windowSize
+
+        self.samples = {}
+        self.phaseOrder = []
+
+        self.lastMark = time.perf_counter()
+        self.frameStart = None
+
+    def startPhase(self):
+        self.lastMark = time.perf_counter()
+
+    def mark(self, phaseName):
+        now = time.perf_counter()
+        self.record(phaseName, now - self.lastMark)
+        self.lastMark = now
+
+    def record(self, phaseName, duration):
+        phaseSamples = self.samples.get(phaseName, None)
+        if phaseSamples is None:
+            phaseSamples = deque(maxlen = self.windowSize)
+            self.samples[phaseName] = phaseSamples
+            self.phaseOrder.append(phaseName)
+        phaseSamples.append(duration)
+
+    # The profiler can measure the parts of the frame that Panda
+    # runs for us--the collision-traversal and the render--by
+    # slipping tasks in around them
+    def attach(self, taskMgr):
+        taskMgr.add(self.frameStartTask, "profileFrameStart", sort = -60)
+        taskMgr.add(self.beforeCollisionTask, "profileBeforeCollision", sort = 25)
+        taskMgr.add(self.afterCollisionTask, "profileAfterCollision", sort = 40)
+        taskMgr.add(self.afterRenderTask, "profileAfterRender", sort = 55)
+
+    def detach(self, taskMgr):
+        for taskName in ("profileFrameStart", "profileBeforeCollision",
+                         "profileAfterCollision", "profileAfterRender"):
+            taskMgr.remove(taskName)
+
+    def frameStartTask(self, task):
+        now = time.perf_counter()
+        if self.frameStart is not None:
+            self.record("frame", now - self.frameStart)
+        self.frameStart = now
+        return task.cont
+
+    def beforeCollisionTask(self, task):
+        self.startPhase()
+        return task.cont
+
+    def afterCollisionTask(self, task):
+        self.mark("collision")
+        return task.cont
+
+    def afterRenderTask(self, task):
+        self.mark("render")
+        return task.cont
+
+    def getPhaseReport(self, phaseName):
+        sortedSamples = sorted(self.samples[phaseName])
+        count = len(sortedSamples)
+
+        histogram = [0]*(len(HISTOGRAM_EDGES) + 1)
+        bucket = 0
+        for sample in sortedSamples:
+            sampleMs = sample*1000.0
+            while bucket < len(HISTOGRAM_EDGES) and sampleMs > HISTOGRAM_EDGES[bucket]:
+                bucket += 1
+            histogram[bucket] += 1
+
+        return {
+            "count" : count,
+            "meanMs" : sum(sortedSamples)*1000.0/count,
+            "p50Ms" : percentile(sortedSamples, 0.5)*1000.0,
+            "p95Ms" : percentile(sortedSamples, 0.95)*1000.0,
+            "p99Ms" : percentile(sortedSamples, 0.99)*1000.0,
+            "maxMs" : sortedSamples[-1]*1000.0,
+            "histogram" : histogram
+        }
+
+    def getReport(self):
+        return {
+            "windowSize" : self.windowSize,
+            "histogramEdgesMs" : HISTOGRAM_EDGES,
+            "phases" : {phaseName : self.getPhaseReport(phaseName) for phaseName in self.phaseOrder}
+        }
+
+    def writeJson(self, fileName):
+        with open(fileName, "w") as outputFile:
+            json.dump(self.getReport(), outputFile, indent = 2)
+
+    def printSummary(self):
+        print("{0:<16}{1:>8}{2:>10}{3:>10}{4:>10}{5:>10}".format("phase", "count", "mean ms", "p50 ms", "p95 ms", "p99 ms"))
+        for phaseName in self.phaseOrder:
+            report = self.getPhaseReport(phaseName)
+            print("{0:<16}{count:>8}{meanMs:>10.3f}{p50Ms:>10.3f}{p95Ms:>10.3f}{p99Ms:>10.3f}".format(phaseName, **report))
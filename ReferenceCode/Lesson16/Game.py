@@ -9,31 +9,107 @@
 #                                                   #
 #####################################################
 
+# Imported first, so that the startup-trace can
+# include the time taken by the imports below
+from StartupTrace import StartupTrace
+
 from direct.showbase.ShowBase import ShowBase
 
 from direct.actor.Actor import Actor
-from panda3d.core import CollisionTraverser, CollisionHandlerPusher, CollisionSphere, CollisionTube, CollisionNode
+from panda3d.core import CollisionTraverser, CollisionHandlerPusher
 from panda3d.core import AmbientLight, DirectionalLight
 from panda3d.core import Vec4, Vec3
 from panda3d.core import WindowProperties
+from panda3d.core import PerspectiveLens, ClockObject
+from panda3d.core import ConfigVariableBool, ConfigVariableDouble, ConfigVariableInt, ConfigVariableString
+from panda3d.core import loadPrcFileData
 
 from direct.gui.DirectGui import *
 
 from GameObject import *
-
-import random
+from EnemyPool import EnemyPool
+from SfxManager import SfxManager
+from HordeSteering import HordeSteering
+from SpatialHash import SpatialHash
+from FrameProfiler import FrameProfiler
+from InputRecording import InputRecorder, InputPlayback
+from ECS import World, FrictionSystem, MovementSystem, SweptMovementSystem, HealthSystem
+from ArenaBounds import ArenaBounds
+from TrapLanes import TrapLanes
+from ContactDispatch import *
+from HudText import HudTextLayer, HudText
+from AssetCache import AssetCache
+from Preloader import Preloader
+from ActorTemplates import ActorTemplates
+
+import random, time, argparse
 
 class Game(ShowBase):
     def __init__(self):
-        ShowBase.__init__(self)
+        # Tracing startup is off unless asked for, in which case a report
+        # is produced once the title-menu's first frame has been drawn
+        self.startupTrace = StartupTrace(ConfigVariableBool("game-startup-trace", False).getValue())
+        self.startupTraceOutput = ConfigVariableString("game-startup-trace-output", "").getValue()
+        trace = self.startupTrace
+
+        # In headless mode there's no window, no audio, and no
+        # real-time clock: we just simulate as quickly as we can
+        self.headless = ConfigVariableBool("game-headless", False).getValue()
+
+        # A replay drives the game from a recording made earlier,
+        # rather than from the keyboard and mouse
+        self.inputPlayback = None
+        replayFile = ConfigVariableString("game-replay-input", "").getValue()
+        if replayFile != "":
+            self.inputPlayback = InputPlayback(replayFile)
+            self.inputPlayback.applySettings()
+            self.headless = True
+
+        if self.headless:
+            loadPrcFileData("headless", "window-type none\naudio-library-name null")
+
+        with trace.span("engine", "ShowBase"):
+            ShowBase.__init__(self)
+
+        trace.watchLoader(self.loader)
+
+        # Models are loaded from binary copies of their .egg-files where
+        # we can; see AssetCache.py. A packaged build has no .egg-files,
+        # and so just loads its .bam-files as usual.
+        self.assetCache = AssetCache(ConfigVariableString("game-asset-cache-dir", "assetCache").getValue(),
+                                     ConfigVariableBool("game-asset-cache", True).getValue())
+
+        # Our Actors are copied from one kept aside for each model
+        self.actorTemplates = ActorTemplates(self.assetCache, trace)
 
         self.disableMouse()
 
-        properties = WindowProperties()
-        properties.setSize(1000, 750)
-        self.win.requestProperties(properties)
-
-        self.exitFunc = self.cleanup
+        if self.headless:
+            # Without a window we don't get a default camera, but
+            # the player's aiming still wants a lens to extrude through
+            self.camera = render.attachNewNode("camera")
+            self.camLens = PerspectiveLens()
+            self.camLens.setAspectRatio(1000/750)
+        else:
+            properties = WindowProperties()
+            properties.setSize(1000, 750)
+            self.win.requestProperties(properties)
+
+        self.exitFunc = self.onExit
+
+        # Profiling is off unless asked for, in which case
+        # the profiler's report is written out on exit
+        self.profiler = None
+        self.profilerOutput = ConfigVariableString("game-profile-output", "").getValue()
+        if ConfigVariableBool("game-profile", False).getValue():
+            self.profiler = FrameProfiler(ConfigVariableInt("game-profile-window", 600).getValue())
+            self.profiler.attach(taskMgr)
+
+        self.sfxManager = SfxManager()
+        # Enemies attack and die in crowds; a couple of
+        # overlapping copies of those sounds is plenty
+        self.sfxManager.setPolyphony("Sounds/enemyAttack.ogg", 3)
+        self.sfxManager.setPolyphony("Sounds/enemyDie.ogg", 3)
 
         mainLight = DirectionalLight("main light")
         self.mainLightNodePath = render.attachNewNode(mainLight)
@@ -47,7 +123,7 @@ class Game(ShowBase):
 
         render.setShaderAuto()
 
-        self.environment = loader.loadModel("Models/Misc/environment")
+        self.environment = loader.loadModel(self.assetCache.resolve("Models/Misc/environment"))
         self.environment.reparentTo(render)
 
         self.camera.setPos(0, 0, 32)
@@ -77,35 +153,72 @@ class Game(ShowBase):
 
         self.pusher.setHorizontal(True)
 
-        self.pusher.add_in_pattern("%fn-into-%in")
-        self.accept("trapEnemy-into-wall", self.stopTrap)
-        self.accept("trapEnemy-into-trapEnemy", self.stopTrap)
-        self.accept("trapEnemy-into-player", self.trapHitsSomething)
-        self.accept("trapEnemy-into-walkingEnemy", self.trapHitsSomething)
-
-        wallSolid = CollisionTube(-8.0, 0, 0, 8.0, 0, 0, 0.2)
-        wallNode = CollisionNode("wall")
-        wallNode.addSolid(wallSolid)
-        wall = render.attachNewNode(wallNode)
-        wall.setY(8.0)
-
-        wallSolid = CollisionTube(-8.0, 0, 0, 8.0, 0, 0, 0.2)
-        wallNode = CollisionNode("wall")
-        wallNode.addSolid(wallSolid)
-        wall = render.attachNewNode(wallNode)
-        wall.setY(-8.0)
-
-        wallSolid = CollisionTube(0, -8.0, 0, 0, 8.0, 0, 0.2)
-        wallNode = CollisionNode("wall")
-        wallNode.addSolid(wallSolid)
-        wall = render.attachNewNode(wallNode)
-        wall.setX(8.0)
-
-        wallSolid = CollisionTube(0, -8.0, 0, 0, 8.0, 0, 0.2)
-        wallNode = CollisionNode("wall")
-        wallNode.addSolid(wallSolid)
-        wall = render.attachNewNode(wallNode)
-        wall.setX(-8.0)
+        # Contacts are handed straight to the relevant method
+        # below, according to the sorts of things involved
+        self.contacts = ContactDispatcher()
+        self.contacts.addHandler(CONTACT_TRAP_ENEMY, CONTACT_WALL, self.stopTrap)
+        self.contacts.addHandler(CONTACT_TRAP_ENEMY, CONTACT_TRAP_ENEMY, self.stopTrap)
+        self.contacts.addHandler(CONTACT_TRAP_ENEMY, CONTACT_PLAYER, self.trapHitsPlayer)
+        self.contacts.addHandler(CONTACT_TRAP_ENEMY, CONTACT_WALKING_ENEMY, self.trapHitsEnemy)
+
+        # The arena runs from -8 to 8 on each axis
+        self.spatialHash = SpatialHash(-8.0, -8.0, 16.0, 1.0)
+
+        # The data of our game-objects is kept in the world's
+        # component-stores, and worked on by these systems
+        self.world = World()
+        self.frictionSystem = FrictionSystem(self.world, FRICTION)
+        self.movementSystem = MovementSystem(self.world)
+        self.sweptMovementSystem = SweptMovementSystem(self.world, self.spatialHash)
+        self.sweptMovementSystem.addListener(self.contacts.reportContact)
+        self.healthSystem = HealthSystem(self.world)
+
+        # The player and the traps are kept inside the walls--which are
+        # 0.2 units thick--by this, rather than by the pusher; the pusher
+        # thus only deals with objects bumping into each other. The
+        # player's laser likewise stops where this says the walls are.
+        self.arenaBounds = ArenaBounds(self.world, -8.0, -8.0, 8.0, 8.0, 0.2, self.contacts)
+
+        # A tick-rate of zero means "one variable-length tick per frame";
+        # anything else steps the game in fixed increments
+        self.tickRate = ConfigVariableDouble("game-tick-rate", 0).getValue()
+        recordFile = ConfigVariableString("game-record-input", "").getValue()
+        if self.inputPlayback is not None:
+            self.tickRate = self.inputPlayback.tickRate
+        elif (self.headless or recordFile != "") and self.tickRate <= 0:
+            self.tickRate = 60.0
+        if self.tickRate > 0:
+            self.tickLength = 1.0/self.tickRate
+        else:
+            self.tickLength = 0
+        self.tickAccumulator = 0
+        self.maxTicksPerFrame = 8
+
+        self.tickCount = 0
+        self.simTime = 0
+        self.simDuration = ConfigVariableDouble("game-sim-duration", 0).getValue()
+        self.simStartTime = time.perf_counter()
+
+        # When headless, or recording, each frame advances the clock--and
+        # thus animations and doLaters--by exactly one tick. A recording
+        # still runs in real time, but should the game fall behind, it
+        # slows down rather than skipping ticks.
+        self.lockstep = self.headless or recordFile != ""
+        if self.headless:
+            globalClock.setMode(ClockObject.MNonRealTime)
+            globalClock.setFrameRate(self.tickRate)
+        elif self.lockstep:
+            globalClock.setMode(ClockObject.MForced)
+            globalClock.setFrameRate(self.tickRate)
+
+        # When recording or replaying, everything random is seeded from
+        # this when the game starts, so that the replay matches exactly
+        self.inputRecorder = None
+        self.rngSeed = None
+        if self.inputPlayback is not None:
+            self.rngSeed = self.inputPlayback.seed
+        elif recordFile != "":
+            self.rngSeed = random.randrange(2**32)
 
         self.updateTask = taskMgr.add(self.update, "update")
 
@@ -113,8 +226,13 @@ class Game(ShowBase):
         
         self.enemies = []
         self.trapEnemies = []
+        self.trapLanes = TrapLanes()
+
+        # Enemies that are playing their death-animations; each
+        # will be put away once its animation is done
+        self.deadEnemies = set()
 
-        self.deadEnemies = []
+        self.enemyPool = EnemyPool(WalkingEnemy)
 
         self.spawnPoints = []
         numPointsPerWall = 5
@@ -129,31 +247,191 @@ class Game(ShowBase):
         self.minimumSpawnInterval = 0.2
         self.spawnInterval = self.initialSpawnInterval
         self.spawnTimer = self.spawnInterval
-        self.maxEnemies = 2
-        self.maximumMaxEnemies = 20
+        self.maximumMaxEnemies = ConfigVariableInt("game-max-enemies", 20).getValue()
+        self.maxEnemies = min(2, self.maximumMaxEnemies)
+
+        # Optionally, update all of the walking enemies' movement
+        # together, which lets us handle far larger crowds
+        self.hordeSteering = None
+        if ConfigVariableBool("game-batched-steering", False).getValue():
+            # Quietly falling back would make the game play out
+            # differently from what was asked for--and from any
+            # recording made with batched steering
+            if not HordeSteering.isAvailable():
+                raise RuntimeError("Batched steering requires NumPy, which isn't installed (see requirements.txt)")
+            self.hordeSteering = HordeSteering(self.maximumMaxEnemies)
         
-        self.numTrapsPerSide = 2
+        self.numTrapsPerSide = ConfigVariableInt("game-traps-per-side", 2).getValue()
+
+        # The recorder is only made once the settings that it
+        # notes down have been read
+        if recordFile != "":
+            self.inputRecorder = InputRecorder(recordFile, self.rngSeed, self.tickRate,
+                                               self.getSimulationSettings())
         
         self.difficultyInterval = 5.0
         self.difficultyTimer = self.difficultyInterval
 
-        self.enemySpawnSound = loader.loadSfx("Sounds/enemySpawn.ogg")
+        self.enemySpawnSound = self.sfxManager.getSound("Sounds/enemySpawn.ogg")
 
-        self.gameOverScreen = DirectDialog(frameSize = (-0.7, 0.7, -0.7, 0.7),
-                                           fadeScreen = 0.4,
-                                           relief = DGG.FLAT,
-                                           frameTexture = "UI/stoneFrame.png")
-        self.gameOverScreen.hide()
+        # Changes to the HUD's text are applied once per frame
+        self.hudText = HudTextLayer()
+
+        # The game-over screen is only built once it's first needed
+        self.gameOverScreen = None
+        self.finalScoreLabel = None
+        self.finalScoreText = None
 
         self.font = loader.loadFont("Fonts/Wbxkomik.ttf")
 
-        buttonImages = (
+        self.buttonImages = (
             loader.loadTexture("UI/UIButton.png"),
             loader.loadTexture("UI/UIButtonPressed.png"),
             loader.loadTexture("UI/UIButtonHighlighted.png"),
             loader.loadTexture("UI/UIButtonDisabled.png")
         )
 
+        with trace.span("widget", "titleMenuBackdrop"):
+            self.titleMenuBackdrop = DirectFrame(frameColor = (0, 0, 0, 1),
+                                                 frameSize = (-1, 1, -1, 1),
+                                                 parent = render2d)
+
+            self.titleMenu = DirectFrame(frameColor = (1, 1, 1, 0))
+
+        with trace.span("widget", "titleLabels"):
+            title = DirectLabel(text = "Panda-chan",
+                                scale = 0.1,
+                                pos = (0, 0, 0.9),
+                                parent = self.titleMenu,
+                                relief = None,
+                                text_font = self.font,
+                                text_fg = (1, 1, 1, 1))
+            title2 = DirectLabel(text = "and the",
+                                 scale = 0.07,
+                                 pos = (0, 0, 0.79),
+                                 parent = self.titleMenu,
+                                 text_font = self.font,
+                                 frameColor = (0.5, 0.5, 0.5, 1))
+            title3 = DirectLabel(text = "Endless Horde",
+                                 scale = 0.125,
+                                 pos = (0, 0, 0.65),
+                                 parent = self.titleMenu,
+                                 relief = None,
+                                 text_font = self.font,
+                                 text_fg = (1, 1, 1, 1))
+
+        with trace.span("widget", "startButton"):
+            btn = DirectButton(text = "Start Game",
+                               command = self.startGame,
+                               pos = (0, 0, 0.2),
+                               parent = self.titleMenu,
+                               scale = 0.1,
+                               text_font = self.font,
+                               clickSound = self.sfxManager.getSharedSound("Sounds/UIClick.ogg"),
+                               frameTexture = self.buttonImages,
+                               frameSize = (-4, 4, -1, 1),
+                               text_scale = 0.75,
+                               relief = DGG.FLAT,
+                               text_pos = (0, -0.2))
+            btn.setTransparency(True)
+
+        with trace.span("widget", "quitButton"):
+            btn = DirectButton(text = "Quit",
+                               command = self.quit,
+                               pos = (0, 0, -0.2),
+                               parent = self.titleMenu,
+                               scale = 0.1,
+                               text_font = self.font,
+                               clickSound = self.sfxManager.getSharedSound("Sounds/UIClick.ogg"),
+                               frameTexture = self.buttonImages,
+                               frameSize = (-4, 4, -1, 1),
+                               text_scale = 0.75,
+                               relief = DGG.FLAT,
+                               text_pos = (0, -0.2))
+            btn.setTransparency(True)
+
+        with trace.span("audio", "music"):
+            music = loader.loadMusic("Music/Defending-the-Princess-Haunted.ogg")
+            music.setLoop(True)
+            music.setVolume(0.075)
+            music.play()
+
+        # While the title-menu is up, load the game's
+        # models and sounds in the background
+        self.preloader = None
+        self.preloadBar = None
+        if not self.headless:
+            with trace.span("preload", "requests"):
+                self.startPreloading()
+
+        if self.headless:
+            self.titleMenu.hide()
+            self.titleMenuBackdrop.hide()
+            self.startGame()
+
+        trace.finishAfterFirstFrame(taskMgr, self.reportStartupTrace)
+
+    def startPreloading(self):
+        modelNames = [
+            "Models/PandaChan/act_p3d_chan",
+            "Models/PandaChan/a_p3d_chan_idle",
+            "Models/PandaChan/a_p3d_chan_run",
+            "Models/Misc/bambooLaser",
+            "Models/Misc/bambooLaserHit",
+            "Models/Misc/playerHit",
+            "Models/Misc/simpleEnemy",
+            "Models/Misc/simpleEnemy-stand",
+            "Models/Misc/simpleEnemy-walk",
+            "Models/Misc/simpleEnemy-attack",
+            "Models/Misc/simpleEnemy-die",
+            "Models/Misc/simpleEnemy-spawn",
+            "Models/Misc/trap",
+            "Models/Misc/trap-stand",
+            "Models/Misc/trap-walk"
+        ]
+        soundNames = [
+            "Sounds/laserNoHit.ogg",
+            "Sounds/laserHit.ogg",
+            "Sounds/FemaleDmgNoise.ogg",
+            "Sounds/enemyDie.ogg",
+            "Sounds/enemyAttack.ogg",
+            "Sounds/trapHitsSomething.ogg",
+            "Sounds/trapStop.ogg",
+            "Sounds/trapSlide.ogg"
+        ]
+
+        self.preloadBar = DirectWaitBar(range = len(modelNames) + len(soundNames),
+                                        value = 0,
+                                        pos = (0, 0, -0.5),
+                                        scale = (0.4, 1, 0.5),
+                                        parent = self.titleMenu,
+                                        frameColor = (0.2, 0.2, 0.2, 1),
+                                        barColor = (1, 1, 1, 1))
+
+        self.preloader = Preloader(loader, self.sfxManager, self.assetCache)
+        self.preloader.addListener(self.preloadProgressed)
+        self.preloader.start(modelNames, soundNames)
+
+    def preloadProgressed(self, numLoaded, total):
+        self.preloadBar["value"] = numLoaded
+        if numLoaded >= total:
+            self.preloadBar.hide()
+
+    def reportStartupTrace(self, trace):
+        if self.startupTraceOutput != "":
+            trace.writeJson(self.startupTraceOutput)
+        else:
+            trace.printSummary()
+
+    def buildGameOverScreen(self):
+        buttonImages = self.buttonImages
+
+        self.gameOverScreen = DirectDialog(frameSize = (-0.7, 0.7, -0.7, 0.7),
+                                           fadeScreen = 0.4,
+                                           relief = DGG.FLAT,
+                                           frameTexture = "UI/stoneFrame.png")
+        self.gameOverScreen.hide()
+
         label = DirectLabel(text = "Game Over!",
                             parent = self.gameOverScreen,
                             scale = 0.1,
@@ -167,6 +445,7 @@ class Game(ShowBase):
                                            pos = (0, 0, 0),
                                            text_font = self.font,
                                            relief = None)
+        self.finalScoreText = HudText(self.hudText, self.finalScoreLabel)
 
         btn = DirectButton(text = "Restart",
                            command = self.startGame,
@@ -174,7 +453,7 @@ class Game(ShowBase):
                            parent = self.gameOverScreen,
                            scale = 0.07,
                            text_font = self.font,
-                           clickSound = loader.loadSfx("Sounds/UIClick.ogg"),
+                           clickSound = self.sfxManager.getSharedSound("Sounds/UIClick.ogg"),
                            frameTexture = buttonImages,
                            frameSize = (-4, 4, -1, 1),
                            text_scale = 0.75,
@@ -188,7 +467,7 @@ class Game(ShowBase):
                            parent = self.gameOverScreen,
                            scale = 0.07,
                            text_font = self.font,
-                           clickSound = loader.loadSfx("Sounds/UIClick.ogg"),
+                           clickSound = self.sfxManager.getSharedSound("Sounds/UIClick.ogg"),
                            frameTexture = buttonImages,
                            frameSize = (-4, 4, -1, 1),
                            text_scale = 0.75,
@@ -196,77 +475,33 @@ class Game(ShowBase):
                            text_pos = (0, -0.2))
         btn.setTransparency(True)
 
-        self.titleMenuBackdrop = DirectFrame(frameColor = (0, 0, 0, 1),
-                                             frameSize = (-1, 1, -1, 1),
-                                             parent = render2d)
+    def showGameOverScreen(self):
+        if self.gameOverScreen is None:
+            self.buildGameOverScreen()
 
-        self.titleMenu = DirectFrame(frameColor = (1, 1, 1, 0))
-
-        title = DirectLabel(text = "Panda-chan",
-                            scale = 0.1,
-                            pos = (0, 0, 0.9),
-                            parent = self.titleMenu,
-                            relief = None,
-                            text_font = self.font,
-                            text_fg = (1, 1, 1, 1))
-        title2 = DirectLabel(text = "and the",
-                             scale = 0.07,
-                             pos = (0, 0, 0.79),
-                             parent = self.titleMenu,
-                             text_font = self.font,
-                             frameColor = (0.5, 0.5, 0.5, 1))
-        title3 = DirectLabel(text = "Endless Horde",
-                             scale = 0.125,
-                             pos = (0, 0, 0.65),
-                             parent = self.titleMenu,
-                             relief = None,
-                             text_font = self.font,
-                             text_fg = (1, 1, 1, 1))
-
-        btn = DirectButton(text = "Start Game",
-                           command = self.startGame,
-                           pos = (0, 0, 0.2),
-                           parent = self.titleMenu,
-                           scale = 0.1,
-                           text_font = self.font,
-                           clickSound = loader.loadSfx("Sounds/UIClick.ogg"),
-                           frameTexture = buttonImages,
-                           frameSize = (-4, 4, -1, 1),
-                           text_scale = 0.75,
-                           relief = DGG.FLAT,
-                           text_pos = (0, -0.2))
-        btn.setTransparency(True)
-
-        btn = DirectButton(text = "Quit",
-                           command = self.quit,
-                           pos = (0, 0, -0.2),
-                           parent = self.titleMenu,
-                           scale = 0.1,
-                           text_font = self.font,
-                           clickSound = loader.loadSfx("Sounds/UIClick.ogg"),
-                           frameTexture = buttonImages,
-                           frameSize = (-4, 4, -1, 1),
-                           text_scale = 0.75,
-                           relief = DGG.FLAT,
-                           text_pos = (0, -0.2))
-        btn.setTransparency(True)
-
-        music = loader.loadMusic("Music/Defending-the-Princess-Haunted.ogg")
-        music.setLoop(True)
-        music.setVolume(0.075)
-        music.play()
+        self.gameOverScreen.show()
+        self.finalScoreText.setText("Final score: " + str(self.player.score))
 
     def startGame(self):
         self.titleMenu.hide()
         self.titleMenuBackdrop.hide()
-        self.gameOverScreen.hide()
+        if self.gameOverScreen is not None:
+            self.gameOverScreen.hide()
 
         self.cleanup()
 
+        if self.rngSeed is not None:
+            random.seed(self.rngSeed)
+
         self.player = Player()
 
-        self.maxEnemies = 2
+        # Make sure that we have enough enemies on hand that we
+        # don't have to build any new ones while the game is running
+        self.enemyPool.reserve(self.maximumMaxEnemies)
+
+        self.maxEnemies = min(2, self.maximumMaxEnemies)
         self.spawnInterval = self.initialSpawnInterval
+        self.spawnTimer = self.spawnInterval
 
         self.difficultyTimer = self.difficultyInterval
 
@@ -286,7 +521,9 @@ class Game(ShowBase):
                 sideTrapSlots[3].append(slotPos)
             slotPos += trapSlotDistance
 
-        for i in range(self.numTrapsPerSide):
+        # There's only room for so many traps along each wall
+        numTrapsPerSide = min(self.numTrapsPerSide, len(sideTrapSlots[0]))
+        for i in range(numTrapsPerSide):
             slot = sideTrapSlots[0].pop(random.randint(0, len(sideTrapSlots[0])-1))
             trap = TrapEnemy(Vec3(slot, 7.0, 0))
             self.trapEnemies.append(trap)
@@ -305,6 +542,9 @@ class Game(ShowBase):
             trap.moveInX = True
             self.trapEnemies.append(trap)
 
+        for trap in self.trapEnemies:
+            self.trapLanes.add(trap)
+
     def updateKeyMap(self, controlName, controlState):
         self.keyMap[controlName] = controlState
 
@@ -312,111 +552,363 @@ class Game(ShowBase):
         if len(self.enemies) < self.maxEnemies:
             spawnPoint = random.choice(self.spawnPoints)
 
-            newEnemy = WalkingEnemy(spawnPoint)
+            newEnemy = self.enemyPool.acquire(spawnPoint)
 
             self.enemies.append(newEnemy)
+            if self.hordeSteering is not None:
+                self.hordeSteering.add(newEnemy)
 
             self.enemySpawnSound.play()
 
-    def stopTrap(self, entry):
-        collider = entry.getFromNodePath()
-        if collider.hasPythonTag("owner"):
-            trap = collider.getPythonTag("owner")
-            trap.moveDirection = 0
-            trap.ignorePlayer = False
-            trap.movementSound.stop()
-            trap.stopSound.play()
-
-    def trapHitsSomething(self, entry):
-        collider = entry.getFromNodePath()
-        if collider.hasPythonTag("owner"):
-            trap = collider.getPythonTag("owner")
-            if trap.moveDirection == 0:
-                return
-
-            collider = entry.getIntoNodePath()
-            if collider.hasPythonTag("owner"):
-                obj = collider.getPythonTag("owner")
-                if isinstance(obj, Player):
-                    if not trap.ignorePlayer:
-                        obj.alterHealth(-1)
-                        trap.ignorePlayer = True
-                else:
-                    obj.alterHealth(-10)
-                trap.impactSound.play()
+    # "obj" is the other trap--or None, if we hit a wall
+    def stopTrap(self, trap, obj):
+        trap.moveDirection = 0
+        trap.ignorePlayer = False
+        trap.movementSound.stop()
+        trap.stopSound.play()
+
+        # File it under wherever it came to rest
+        self.trapLanes.add(trap)
+
+    def trapHitsPlayer(self, trap, player):
+        if trap.moveDirection == 0:
+            return
+
+        if not trap.ignorePlayer:
+            player.alterHealth(-1)
+            trap.ignorePlayer = True
+        trap.impactSound.play()
+
+    def trapHitsEnemy(self, trap, enemy):
+        if trap.moveDirection == 0:
+            return
+
+        enemy.alterHealth(-10)
+        trap.impactSound.play()
 
     def update(self, task):
-        dt = globalClock.getDt()
+        if self.inputPlayback is not None and self.inputPlayback.isFinished():
+            self.finishSimulation()
+            return task.cont
+
+        if self.tickLength <= 0:
+            self.tick(globalClock.getDt())
+        elif self.lockstep:
+            # The clock is already stepping in fixed increments,
+            # so there's nothing to accumulate
+            self.tick(self.tickLength)
+        else:
+            self.tickAccumulator += globalClock.getDt()
+            numTicks = 0
+            while self.tickAccumulator >= self.tickLength:
+                if numTicks >= self.maxTicksPerFrame:
+                    # We've fallen too far behind to catch up;
+                    # drop the remainder rather than spiralling
+                    self.tickAccumulator = 0
+                    break
+                self.tick(self.tickLength)
+                self.tickAccumulator -= self.tickLength
+                numTicks += 1
+
+        if self.player is not None and self.player.health <= 0:
+            if self.inputRecorder is not None:
+                # Only the one game is recorded
+                print("Recorded {0} ticks".format(self.inputRecorder.numTicks))
+                self.inputRecorder.close()
+                self.inputRecorder = None
+
+            if self.inputPlayback is not None:
+                self.finishSimulation()
+            elif self.headless:
+                self.startGame()
+            elif self.gameOverScreen is None or self.gameOverScreen.isHidden():
+                self.showGameOverScreen()
+
+        if self.simDuration > 0 and self.simTime >= self.simDuration:
+            self.finishSimulation()
+
+        return task.cont
+
+    def tick(self, dt):
+        self.tickCount += 1
+        self.simTime += dt
+
+        if self.player is None or self.player.health <= 0:
+            return
+
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.startPhase()
+
+        self.frictionSystem.update(dt)
+        self.movementSystem.update(dt)
+
+        if profiler is not None:
+            profiler.mark("movement")
+
+        keys, aimPoint = self.readInput()
+        self.player.update(keys, aimPoint, dt)
+
+        if profiler is not None:
+            profiler.mark("player")
+
+        self.spawnTimer -= dt
+        if self.spawnTimer <= 0:
+            self.spawnTimer = self.spawnInterval
+            self.spawnEnemy()
+
+        if profiler is not None:
+            profiler.mark("spawn")
+
+        self.updateSpatialHash()
+
+        if profiler is not None:
+            profiler.mark("spatialHash")
+
+        # The laser is cast against the freshly-built spatial hash,
+        # so that it hits the enemies where they are now
+        self.player.updateLaser(keys, dt)
+
+        if profiler is not None:
+            profiler.mark("laser")
+
+        # The traps are moved once the spatial hash is up to date,
+        # as they're checked against it along the way
+        self.sweptMovementSystem.update(dt)
+        self.arenaBounds.update()
+
+        # Moving traps are the only things whose contacts we care about;
+        # the walls may have pulled them back, so re-file them first
+        movingTraps = [trap for trap in self.trapEnemies if trap.moveDirection != 0]
+        for trap in movingTraps:
+            self.spatialHash.update(trap, trap.position.x, trap.position.y)
+        self.contacts.findContacts(movingTraps, self.spatialHash)
+        self.contacts.endTick()
+
+        if profiler is not None:
+            profiler.mark("sweptMovement")
+
+        if self.hordeSteering is not None:
+            self.hordeSteering.update(self.player, dt)
+        else:
+            [enemy.update(self.player, dt) for enemy in self.enemies]
+
+        if profiler is not None:
+            profiler.mark("enemies")
+
+        for trap in self.trapLanes.findTriggered(self.player.position):
+            trap.startMoving(self.player)
+
+        [trap.update(self.player, dt) for trap in self.trapEnemies]
+
+        if profiler is not None:
+            profiler.mark("traps")
 
+        # The player's death is handled in "update", above
+        newlyDeadEnemies = [deadObject for deadObject in self.healthSystem.collectDeaths()
+                            if deadObject is not self.player]
+        if len(newlyDeadEnemies) > 0:
+            deadSet = set(newlyDeadEnemies)
+            self.enemies = [enemy for enemy in self.enemies if enemy not in deadSet]
+
+        for enemy in newlyDeadEnemies:
+            if self.hordeSteering is not None:
+                self.hordeSteering.remove(enemy)
+            enemy.disableMovement()
+            enemy.collider.stash()
+            self.startEnemyDeath(enemy)
+            self.player.score += enemy.scoreValue
+        if len(newlyDeadEnemies) > 0:
+            self.player.updateScore()
+
+        if profiler is not None:
+            profiler.mark("deadFiltering")
+
+        self.difficultyTimer -= dt
+        if self.difficultyTimer <= 0:
+            self.difficultyTimer = self.difficultyInterval
+            if self.maxEnemies < self.maximumMaxEnemies:
+                self.maxEnemies += 1
+            if self.spawnInterval > self.minimumSpawnInterval:
+                self.spawnInterval -= 0.1
+
+        if profiler is not None:
+            profiler.mark("difficulty")
+
+    def startEnemyDeath(self, enemy):
+        deathDuration = enemy.animState.getDuration("die")
+        if deathDuration is None:
+            self.enemyPool.release(enemy)
+            return
+
+        enemy.animState.request("die", loop = False)
+
+        # Rather than checking every frame whether the animation
+        # is done, we just arrange to be told when it should be
+        self.deadEnemies.add(enemy)
+        enemy.deathTask = taskMgr.doMethodLater(deathDuration, self.finishEnemyDeath,
+                                                "finishEnemyDeath", extraArgs = [enemy])
+
+    def finishEnemyDeath(self, enemy):
+        enemy.deathTask = None
+        self.deadEnemies.discard(enemy)
+        self.enemyPool.release(enemy)
+
+    def readInput(self):
+        if self.inputPlayback is not None:
+            return self.inputPlayback.readTick()
+
+        aimPoint = self.player.getAimPoint()
+        if self.inputRecorder is not None:
+            self.inputRecorder.recordTick(self.keyMap, aimPoint)
+
+        return self.keyMap, aimPoint
+
+    def updateSpatialHash(self):
+        spatialHash = self.spatialHash
+        spatialHash.clear()
+
+        pos = self.player.position
+        spatialHash.insert(self.player, pos.x, pos.y)
+
+        for trap in self.trapEnemies:
+            pos = trap.position
+            spatialHash.insert(trap, pos.x, pos.y)
+
+        for enemy in self.enemies:
+            pos = enemy.position
+            spatialHash.insert(enemy, pos.x, pos.y)
+
+    # The settings that change how the game plays out--as they
+    # actually took effect--in the form of configuration-lines
+    def getSimulationSettings(self):
+        return {
+            "game-max-enemies" : str(self.maximumMaxEnemies),
+            "game-traps-per-side" : str(self.numTrapsPerSide),
+            "game-batched-steering" : "#t" if self.hordeSteering is not None else "#f"
+        }
+
+    def getSimulationStats(self):
+        wallTime = time.perf_counter() - self.simStartTime
+        if wallTime > 0:
+            ticksPerSecond = self.tickCount/wallTime
+        else:
+            ticksPerSecond = 0
+        return {
+            "ticks" : self.tickCount,
+            "simTime" : self.simTime,
+            "wallTime" : wallTime,
+            "ticksPerSecond" : ticksPerSecond
+        }
+
+    def finishSimulation(self):
+        stats = self.getSimulationStats()
+        print("Simulated {simTime:.1f}s of play in {ticks} ticks over {wallTime:.2f}s ({ticksPerSecond:.0f} ticks per second)".format(**stats))
         if self.player is not None:
-            if self.player.health > 0:
-                self.player.update(self.keyMap, dt)
-
-                self.spawnTimer -= dt
-                if self.spawnTimer <= 0:
-                    self.spawnTimer = self.spawnInterval
-                    self.spawnEnemy()
-
-                [enemy.update(self.player, dt) for enemy in self.enemies]
-                [trap.update(self.player, dt) for trap in self.trapEnemies]
-
-                newlyDeadEnemies = [enemy for enemy in self.enemies if enemy.health <= 0]
-                self.enemies = [enemy for enemy in self.enemies if enemy.health > 0]
-
-                for enemy in newlyDeadEnemies:
-                    enemy.collider.removeNode()
-                    enemy.actor.play("die")
-                    self.player.score += enemy.scoreValue
-                if len(newlyDeadEnemies) > 0:
-                    self.player.updateScore()
-
-                self.deadEnemies += newlyDeadEnemies
-
-                enemiesAnimatingDeaths = []
-                for enemy in self.deadEnemies:
-                    deathAnimControl = enemy.actor.getAnimControl("die")
-                    if deathAnimControl is None or not deathAnimControl.isPlaying():
-                        enemy.cleanup()
-                    else:
-                        enemiesAnimatingDeaths.append(enemy)
-                self.deadEnemies = enemiesAnimatingDeaths
-
-                self.difficultyTimer -= dt
-                if self.difficultyTimer <= 0:
-                    self.difficultyTimer = self.difficultyInterval
-                    if self.maxEnemies < self.maximumMaxEnemies:
-                        self.maxEnemies += 1
-                    if self.spawnInterval > self.minimumSpawnInterval:
-                        self.spawnInterval -= 0.1
-            else:
-                if self.gameOverScreen.isHidden():
-                    self.gameOverScreen.show()
-                    self.finalScoreLabel["text"] = "Final score: " + str(self.player.score)
-                    self.finalScoreLabel.setText()
+            print("Score: {0}, health: {1}".format(self.player.score, self.player.health))
 
-        return task.cont
+        self.quit()
 
     def cleanup(self):
+        if self.hordeSteering is not None:
+            self.hordeSteering.clear()
+
         for enemy in self.enemies:
-            enemy.cleanup()
+            self.enemyPool.release(enemy)
         self.enemies = []
 
         for enemy in self.deadEnemies:
-            enemy.cleanup()
-        self.deadEnemies = []
+            taskMgr.remove(enemy.deathTask)
+            enemy.deathTask = None
+            self.enemyPool.release(enemy)
+        self.deadEnemies = set()
 
         for trap in self.trapEnemies:
             trap.cleanup()
         self.trapEnemies = []
+        self.trapLanes.clear()
+
+        self.spatialHash.clear()
+        self.arenaBounds.clear()
+        self.contacts.clear()
 
         if self.player is not None:
             self.player.cleanup()
             self.player = None
 
+    def onExit(self):
+        self.cleanup()
+
+        if self.inputRecorder is not None:
+            self.inputRecorder.close()
+            self.inputRecorder = None
+
+        if self.profiler is not None:
+            if self.profilerOutput != "":
+                self.profiler.writeJson(self.profilerOutput)
+            else:
+                self.profiler.printSummary()
+
     def quit(self):
         self.cleanup()
+        if self.preloader is not None:
+            self.preloader.cleanup()
+            self.preloader = None
+        self.enemyPool.cleanup()
+        self.actorTemplates.cleanup()
+        self.sfxManager.cleanup()
+        self.hudText.cleanup()
 
         base.userExit()
 
-game = Game()
-game.run()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Panda-chan and the Endless Horde")
+    parser.add_argument("--headless", action = "store_true",
+                        help = "run without a window or audio, as fast as possible")
+    parser.add_argument("--tick-rate", type = float,
+                        help = "simulate in fixed steps at this many ticks per second")
+    parser.add_argument("--duration", type = float,
+                        help = "stop after simulating this many seconds of play")
+    parser.add_argument("--record", metavar = "FILE",
+                        help = "record one game's input to FILE")
+    parser.add_argument("--replay", metavar = "FILE",
+                        help = "replay a recording from FILE, headless and as fast as possible")
+    parser.add_argument("--profile", metavar = "FILE", nargs = "?", const = "",
+                        help = "time each phase of the frame, writing a JSON report to FILE on exit (or printing a summary)")
+    parser.add_argument("--startup-trace", metavar = "FILE", nargs = "?", const = "",
+                        help = "time each step of starting up, writing a JSON report to FILE (or printing a summary)")
+    parser.add_argument("--batched-steering", action = "store_true",
+                        help = "update all walking enemies at once (requires NumPy)")
+    parser.add_argument("--max-enemies", type = int,
+                        help = "the most walking enemies allowed at once")
+    args = parser.parse_args()
+
+    if args.headless:
+        loadPrcFileData("command-line", "game-headless #t")
+    if args.tick_rate is not None:
+        loadPrcFileData("command-line", "game-tick-rate {0}".format(args.tick_rate))
+    if args.duration is not None:
+        loadPrcFileData("command-line", "game-sim-duration {0}".format(args.duration))
+    if args.record is not None:
+        loadPrcFileData("command-line", "game-record-input {0}".format(args.record))
+    if args.replay is not None:
+        loadPrcFileData("command-line", "game-replay-input {0}".format(args.replay))
+    if args.profile is not None:
+        loadPrcFileData("command-line", "game-profile #t")
+        if args.profile != "":
+            loadPrcFileData("command-line", "game-profile-output {0}".format(args.profile))
+    if args.startup_trace is not None:
+        loadPrcFileData("command-line", "game-startup-trace #t")
+        if args.startup_trace != "":
+            loadPrcFileData("command-line", "game-startup-trace-output {0}".format(args.startup_trace))
+    if args.batched_steering:
+        if not HordeSteering.isAvailable():
+            parser.error("--batched-steering requires NumPy; install it with \"pip install numpy\"")
+        loadPrcFileData("command-line", "game-batched-steering #t")
+    if args.max_enemies is not None:
+        if args.max_enemies < 0:
+            parser.error("--max-enemies can't be negative")
+        loadPrcFileData("command-line", "game-max-enemies {0}".format(args.max_enemies))
+
+    game = Game()
+    game.run()
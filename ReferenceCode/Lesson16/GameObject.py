@@ -10,76 +10,234 @@
 #####################################################
 
 from panda3d.core import Vec4, Vec3, Vec2, Plane, Point3, BitMask32
-from direct.actor.Actor import Actor
-from panda3d.core import CollisionSphere, CollisionNode, CollisionRay, CollisionSegment, CollisionHandlerQueue
-from direct.gui.OnscreenText import OnscreenText
-from direct.gui.OnscreenImage import OnscreenImage
-from panda3d.core import TextNode
+from panda3d.core import CollisionSphere, CollisionNode
 from panda3d.core import AudioSound
 from panda3d.core import PointLight
 
+from AnimationStateMachine import AnimationStateMachine
+from HealthBar import HealthBar
+from HudText import DigitCounter
+from ContactDispatch import CONTACT_PLAYER, CONTACT_WALKING_ENEMY, CONTACT_TRAP_ENEMY
+
 import math, random
 
 FRICTION = 150.0
 
 class GameObject():
+    # Our objects--and especially our enemies--are numerous, and are
+    # updated every frame, so their attributes are kept in slots rather
+    # than in a per-instance dictionary. This makes them smaller and
+    # quicker to work with--and means that assigning to a misspelt
+    # attribute is an error, rather than silently making a new one.
+    #
+    # Most of our data--position, velocity, health, and so on--lives
+    # in the components of our entity in the game's World (see ECS.py),
+    # where the movement- and health-systems can work on it in bulk.
+    # The properties below make it look as though it's still ours.
+    __slots__ = ("world", "entity",
+                 "actor", "animState", "collider",
+                 "position", "acceleration",
+                 "deathSound")
+
+    if __debug__:
+        # A subclass without its own __slots__ would quietly get an
+        # instance-dictionary back, so we insist that each declares them
+        def __init_subclass__(cls, **kwargs):
+            super().__init_subclass__(**kwargs)
+            if "__slots__" not in cls.__dict__:
+                raise TypeError("{0} must declare __slots__, as GameObject does".format(cls.__name__))
+
     def __init__(self, pos, modelName, modelAnims, maxHealth, maxSpeed, colliderName):
-        self.actor = Actor(modelName, modelAnims)
+        self.world = base.world
+        self.entity = self.world.createEntity(self)
+
+        # A copy of our position, kept up to date by the movement-system,
+        # for when we want to do vector-maths with it
+        self.position = Point3(pos)
+
+        self.actor = base.actorTemplates.makeActor(modelName, modelAnims)
         self.actor.reparentTo(render)
-        self.actor.setPos(pos)
+        self.actor.setPos(self.position)
 
-        self.maxHealth = maxHealth
-        self.health = maxHealth
+        self.world.transforms.add(self.entity,
+                                  x = pos.x, y = pos.y, z = pos.z,
+                                  nodePath = self.actor,
+                                  mirror = self.position)
 
-        self.maxSpeed = maxSpeed
+        self.animState = AnimationStateMachine(self.actor)
 
-        self.velocity = Vec3(0, 0, 0)
+        self.world.healths.add(self.entity, health = maxHealth, maxHealth = maxHealth)
+
+        self.world.velocities.add(self.entity, maxSpeed = maxSpeed)
         self.acceleration = 300.0
 
-        self.walking = False
+        colliderRadius = 0.3
 
         colliderNode = CollisionNode(colliderName)
-        colliderNode.addSolid(CollisionSphere(0, 0, 0, 0.3))
+        colliderNode.addSolid(CollisionSphere(0, 0, 0, colliderRadius))
         self.collider = self.actor.attachNewNode(colliderNode)
-        self.collider.setPythonTag("owner", self)
+
+        self.world.colliders.add(self.entity, radius = colliderRadius)
 
         self.deathSound = None
 
-    def update(self, dt):
-        speed = self.velocity.length()
-        if speed > self.maxSpeed:
-            self.velocity.normalize()
-            self.velocity *= self.maxSpeed
-            speed = self.maxSpeed
-
-        if not self.walking:
-            frictionVal = FRICTION*dt
-            if frictionVal > speed:
-                self.velocity.set(0, 0, 0)
-            else:
-                frictionVec = -self.velocity
-                frictionVec.normalize()
-                frictionVec *= frictionVal
+    @property
+    def health(self):
+        return self.world.healths.get(self.entity, "health")
+
+    @health.setter
+    def health(self, value):
+        self.world.healths.set(self.entity, "health", value)
+
+    @property
+    def maxHealth(self):
+        return self.world.healths.get(self.entity, "maxHealth")
+
+    @maxHealth.setter
+    def maxHealth(self, value):
+        self.world.healths.set(self.entity, "maxHealth", value)
+
+    @property
+    def maxSpeed(self):
+        return self.world.velocities.get(self.entity, "maxSpeed")
+
+    @maxSpeed.setter
+    def maxSpeed(self, value):
+        self.world.velocities.set(self.entity, "maxSpeed", value)
+
+    @property
+    def walking(self):
+        return self.world.velocities.get(self.entity, "walking") != 0
+
+    @walking.setter
+    def walking(self, value):
+        self.world.velocities.set(self.entity, "walking", 1 if value else 0)
+
+    # Whether the pusher might move us; if so, the movement-system
+    # checks our actor's position before moving us
+    @property
+    def pushedByCollisions(self):
+        return self.world.velocities.get(self.entity, "pushed") != 0
+
+    @pushedByCollisions.setter
+    def pushedByCollisions(self, value):
+        self.world.velocities.set(self.entity, "pushed", 1 if value else 0)
+
+    @property
+    def colliderRadius(self):
+        return self.world.colliders.get(self.entity, "radius")
+
+    # A copy of our collider's "into" mask, for the spatial hash
+    @property
+    def intoMask(self):
+        return self.world.colliders.get(self.entity, "intoMask")
+
+    @intoMask.setter
+    def intoMask(self, value):
+        self.world.colliders.set(self.entity, "intoMask", value)
+
+    # Likewise our "from" mask, for finding our contacts
+    @property
+    def fromMask(self):
+        return self.world.colliders.get(self.entity, "fromMask")
+
+    @fromMask.setter
+    def fromMask(self, value):
+        self.world.colliders.set(self.entity, "fromMask", value)
+
+    # And the things that stop us, if we're swept
+    @property
+    def blockMask(self):
+        return self.world.colliders.get(self.entity, "blockMask")
+
+    @blockMask.setter
+    def blockMask(self, value):
+        self.world.colliders.set(self.entity, "blockMask", value)
+
+    def getVelocity(self):
+        velocities = self.world.velocities
+        index = velocities.indices[self.entity]
+        return velocities.columns["x"][index], velocities.columns["y"][index]
+
+    def setVelocity(self, x, y):
+        velocities = self.world.velocities
+        index = velocities.indices[self.entity]
+        velocities.columns["x"][index] = x
+        velocities.columns["y"][index] = y
+
+    def accelerate(self, dx, dy):
+        velocities = self.world.velocities
+        index = velocities.indices[self.entity]
+        velocities.columns["x"][index] += dx
+        velocities.columns["y"][index] += dy
+
+    def setHeading(self, heading):
+        self.world.transforms.set(self.entity, "heading", heading)
+        self.actor.setH(heading)
+
+    # Puts us directly at the given spot, for things that
+    # move us without going through the movement-system
+    def placeAt(self, x, y, heading):
+        transforms = self.world.transforms
+        index = transforms.indices[self.entity]
+        transforms.columns["x"][index] = x
+        transforms.columns["y"][index] = y
+        transforms.columns["heading"][index] = heading
 
-                self.velocity += frictionVec
+        self.position.set(x, y, transforms.columns["z"][index])
+        self.actor.setPosHpr(self.position.x, self.position.y, self.position.z, heading, 0, 0)
 
-        self.actor.setPos(self.actor.getPos() + self.velocity*dt)
+    # While movement is disabled, the movement-system leaves us be
+    def enableMovement(self):
+        self.setVelocity(0, 0)
+        self.world.velocities.set(self.entity, "enabled", 1)
+
+    def disableMovement(self):
+        self.setVelocity(0, 0)
+        self.world.velocities.set(self.entity, "enabled", 0)
+
+    def isAlive(self):
+        return self.entity is not None and self.health > 0
 
     def alterHealth(self, dHealth):
         previousHealth = self.health
 
-        self.health += dHealth
+        health = previousHealth + dHealth
 
-        if self.health > self.maxHealth:
-            self.health = self.maxHealth
-        if previousHealth > 0 and self.health <= 0 and self.deathSound is not None:
+        if health > self.maxHealth:
+            health = self.maxHealth
+        self.health = health
+        if previousHealth > 0 and health <= 0 and self.deathSound is not None:
             self.deathSound.play()
 
+    def activate(self, pos):
+        self.actor.reparentTo(render)
+        self.placeAt(pos.x, pos.y, 0)
+        self.actor.clearColorScale()
+
+        self.health = self.maxHealth
+        self.world.healths.set(self.entity, "alive", 1)
+
+        self.enableMovement()
+        self.walking = False
+
+        self.collider.unstash()
+
+    def deactivate(self):
+        self.animState.stop()
+        self.actor.detachNode()
+
+        self.disableMovement()
+
+        self.collider.stash()
+
     def cleanup(self):
         if self.collider is not None and not self.collider.isEmpty():
-            self.collider.clearPythonTag("owner")
             base.cTrav.removeCollider(self.collider)
             base.pusher.removeCollider(self.collider)
+            base.arenaBounds.remove(self)
+
+        self.animState.cleanup()
 
         if self.actor is not None:
             self.actor.cleanup()
@@ -88,7 +246,21 @@ class GameObject():
 
         self.collider = None
 
+        if self.entity is not None:
+            self.world.destroyEntity(self.entity)
+            self.entity = None
+
 class Player(GameObject):
+    contactCategory = CONTACT_PLAYER
+
+    __slots__ = ("score", "scoreUI", "healthBar",
+                 "lastMousePos", "groundPlane", "yVector",
+                 "firingVector", "beamMask",
+                 "beamModel", "beamHitModel", "beamHitPulseRate", "beamHitTimer",
+                 "beamHitLight", "beamHitLightNodePath", "damagePerSecond",
+                 "damageTakenModel", "damageTakenModelTimer", "damageTakenModelDuration",
+                 "laserSoundNoHit", "laserSoundHit", "hurtSound")
+
     def __init__(self):
         GameObject.__init__(self,
                             Vec3(0, 0, 0),
@@ -106,44 +278,39 @@ class Player(GameObject):
         mask.setBit(1)
 
         self.collider.node().setIntoCollideMask(mask)
+        self.intoMask = mask.getWord()
 
         mask = BitMask32()
         mask.setBit(1)
 
         self.collider.node().setFromCollideMask(mask)
+        self.fromMask = mask.getWord()
 
         base.pusher.addCollider(self.collider, self.actor)
         base.cTrav.addCollider(self.collider, base.pusher)
+        self.pushedByCollisions = True
+
+        base.arenaBounds.add(self)
 
         self.lastMousePos = Vec2(0, 0)
 
         self.groundPlane = Plane(Vec3(0, 0, 1), Vec3(0, 0, 0))
 
-        self.ray = CollisionRay(0, 0, 0, 0, 1, 0)
-
-        rayNode = CollisionNode("playerRay")
-        rayNode.addSolid(self.ray)
-
+        # Our laser is cast through the game's spatial hash when
+        # we fire, hitting the things that a ray with this "from"
+        # mask would--and otherwise stopping at the walls
         mask = BitMask32()
-
         mask.setBit(2)
-        rayNode.setFromCollideMask(mask)
 
-        mask = BitMask32()
-        rayNode.setIntoCollideMask(mask)
+        self.beamMask = mask.getWord()
 
-        self.rayNodePath = render.attachNewNode(rayNode)
-        self.rayQueue = CollisionHandlerQueue()
-
-        base.cTrav.addCollider(self.rayNodePath, self.rayQueue)
-
-        self.beamModel = loader.loadModel("Models/Misc/bambooLaser")
+        self.beamModel = loader.loadModel(base.assetCache.resolve("Models/Misc/bambooLaser"))
         self.beamModel.reparentTo(self.actor)
         self.beamModel.setZ(1.5)
         self.beamModel.setLightOff()
         self.beamModel.hide()
 
-        self.beamHitModel = loader.loadModel("Models/Misc/bambooLaserHit")
+        self.beamHitModel = loader.loadModel(base.assetCache.resolve("Models/Misc/bambooLaserHit"))
         self.beamHitModel.reparentTo(render)
         self.beamHitModel.setZ(1.5)
         self.beamHitModel.setLightOff()
@@ -156,21 +323,15 @@ class Player(GameObject):
 
         self.score = 0
 
-        self.scoreUI = OnscreenText(text = "0",
-                                    pos = (-1.3, 0.825),
-                                    mayChange = True,
-                                    align = TextNode.ALeft,
-                                    font = base.font)
-
-        self.healthIcons = []
-        for i in range(self.maxHealth):
-            icon = OnscreenImage(image = "UI/health.png",
-                                 pos = (-1.275 + i*0.075, 0, 0.95),
-                                 scale = 0.04)
-            icon.setTransparency(True)
-            self.healthIcons.append(icon)
-
-        self.damageTakenModel = loader.loadModel("Models/Misc/playerHit")
+        self.scoreUI = DigitCounter(base.hudText, base.font, self.score,
+                                    pos = (-1.3, 0.825))
+
+        self.healthBar = HealthBar("UI/health.png", int(self.maxHealth),
+                                   pos = (-1.275, 0, 0.95),
+                                   spacing = 0.075,
+                                   iconScale = 0.04)
+
+        self.damageTakenModel = loader.loadModel(base.assetCache.resolve("Models/Misc/playerHit"))
         self.damageTakenModel.setLightOff()
         self.damageTakenModel.setZ(1.0)
         self.damageTakenModel.reparentTo(self.actor)
@@ -179,9 +340,9 @@ class Player(GameObject):
         self.damageTakenModelTimer = 0
         self.damageTakenModelDuration = 0.15
 
-        self.laserSoundNoHit = loader.loadSfx("Sounds/laserNoHit.ogg")
+        self.laserSoundNoHit = base.sfxManager.getSound("Sounds/laserNoHit.ogg")
         self.laserSoundNoHit.setLoop(True)
-        self.laserSoundHit = loader.loadSfx("Sounds/laserHit.ogg")
+        self.laserSoundHit = base.sfxManager.getSound("Sounds/laserHit.ogg")
         self.laserSoundHit.setLoop(True)
 
         self.beamHitLight = PointLight("beamHitLight")
@@ -189,67 +350,67 @@ class Player(GameObject):
         self.beamHitLight.setAttenuation((1.0, 0.1, 0.5))
         self.beamHitLightNodePath = render.attachNewNode(self.beamHitLight)
 
-        self.hurtSound = loader.loadSfx("Sounds/FemaleDmgNoise.ogg")
+        self.hurtSound = base.sfxManager.getSound("Sounds/FemaleDmgNoise.ogg")
 
         self.yVector = Vec2(0, 1)
+        self.firingVector = Vec2(0, 0)
+
+        self.animState.request("stand")
+
+    # Finds the point on the ground under the mouse--or
+    # under where the mouse was last, if it's left the window
+    def getAimPoint(self):
+        mouseWatcher = base.mouseWatcherNode
+        if mouseWatcher is not None and mouseWatcher.hasMouse():
+            self.lastMousePos = mouseWatcher.getMouse()
+
+        mousePos3D = Point3()
+        nearPoint = Point3()
+        farPoint = Point3()
 
-        self.actor.loop("stand")
+        base.camLens.extrude(self.lastMousePos, nearPoint, farPoint)
+        self.groundPlane.intersectsLine(mousePos3D,
+                                        render.getRelativePoint(base.camera, nearPoint),
+                                        render.getRelativePoint(base.camera, farPoint))
 
-    def update(self, keys, dt):
-        GameObject.update(self, dt)
+        return mousePos3D
 
+    def update(self, keys, aimPoint, dt):
         self.walking = False
 
         if keys["up"]:
             self.walking = True
-            self.velocity.addY(self.acceleration*dt)
+            self.accelerate(0, self.acceleration*dt)
         if keys["down"]:
             self.walking = True
-            self.velocity.addY(-self.acceleration*dt)
+            self.accelerate(0, -self.acceleration*dt)
         if keys["left"]:
             self.walking = True
-            self.velocity.addX(-self.acceleration*dt)
+            self.accelerate(-self.acceleration*dt, 0)
         if keys["right"]:
             self.walking = True
-            self.velocity.addX(self.acceleration*dt)
+            self.accelerate(self.acceleration*dt, 0)
 
         if self.walking:
-            standControl = self.actor.getAnimControl("stand")
-            if standControl.isPlaying():
-                standControl.stop()
-
-            walkControl = self.actor.getAnimControl("walk")
-            if not walkControl.isPlaying():
-                self.actor.loop("walk")
+            self.animState.request("walk")
         else:
-            standControl = self.actor.getAnimControl("stand")
-            if not standControl.isPlaying():
-                self.actor.stop("walk")
-                self.actor.loop("stand")
-
-        mouseWatcher = base.mouseWatcherNode
-        if mouseWatcher.hasMouse():
-            mousePos = mouseWatcher.getMouse()
-        else:
-            mousePos = self.lastMousePos
-
-        mousePos3D = Point3()
-        nearPoint = Point3()
-        farPoint = Point3()
+            self.animState.request("stand")
 
-        base.camLens.extrude(mousePos, nearPoint, farPoint)
-        self.groundPlane.intersectsLine(mousePos3D,
-                                        render.getRelativePoint(base.camera, nearPoint),
-                                        render.getRelativePoint(base.camera, farPoint))
-
-        firingVector = Vec3(mousePos3D - self.actor.getPos())
-        firingVector2D = firingVector.getXy()
+        firingVector2D = Vec3(aimPoint - self.position).getXy()
         firingVector2D.normalize()
-        firingVector.normalize()
 
         heading = self.yVector.signedAngleDeg(firingVector2D)
 
-        self.actor.setH(heading)
+        self.setHeading(heading)
+
+        self.firingVector = firingVector2D
+
+    # Fires our laser, if called for, along the direction that we
+    # faced in our last update. This should be called once the
+    # spatial hash is up to date, so that the laser hits where
+    # things are now, and not where they were.
+    def updateLaser(self, keys, dt):
+        firingVector2D = self.firingVector
 
         self.beamHitTimer -= dt
         if self.beamHitTimer <= 0:
@@ -258,21 +419,26 @@ class Player(GameObject):
         self.beamHitModel.setScale(math.sin(self.beamHitTimer*3.142/self.beamHitPulseRate)*0.4 + 0.9)
 
         if keys["shoot"]:
-            if self.rayQueue.getNumEntries() > 0:
+            if firingVector2D.lengthSquared() > 0:
                 scoredHit = False
 
-                self.rayQueue.sortEntries()
-                rayHit = self.rayQueue.getEntry(0)
-                hitPos = rayHit.getSurfacePoint(render)
+                pos = self.position
+                beamLength = base.arenaBounds.getExitDistance(pos.x, pos.y,
+                                                             firingVector2D.x, firingVector2D.y)
 
-                hitNodePath = rayHit.getIntoNodePath()
-                if hitNodePath.hasPythonTag("owner"):
-                    hitObject = hitNodePath.getPythonTag("owner")
+                hitObject, hitDistance = base.spatialHash.castRay(pos.x, pos.y,
+                                                                  firingVector2D.x, firingVector2D.y,
+                                                                  beamLength, self.beamMask, self)
+                if hitObject is not None:
+                    beamLength = hitDistance
                     if not isinstance(hitObject, TrapEnemy):
                         hitObject.alterHealth(self.damagePerSecond*dt)
                         scoredHit = True
 
-                beamLength = (hitPos - self.actor.getPos()).length()
+                hitPos = Point3(pos.x + firingVector2D.x*beamLength,
+                                pos.y + firingVector2D.y*beamLength,
+                                pos.z)
+
                 self.beamModel.setSy(beamLength)
 
                 self.beamModel.show()
@@ -312,12 +478,6 @@ class Player(GameObject):
             if self.laserSoundHit.status() == AudioSound.PLAYING:
                 self.laserSoundHit.stop()
 
-        if firingVector.length() > 0.001:
-            self.ray.setOrigin(self.actor.getPos())
-            self.ray.setDirection(firingVector)
-
-        self.lastMousePos = mousePos
-
         if self.damageTakenModelTimer > 0:
             self.damageTakenModelTimer -= dt
             self.damageTakenModel.setScale(2.0 - self.damageTakenModelTimer/self.damageTakenModelDuration)
@@ -325,7 +485,7 @@ class Player(GameObject):
                 self.damageTakenModel.hide()
 
     def updateScore(self):
-        self.scoreUI.setText(str(self.score))
+        self.scoreUI.setValue(self.score)
 
     def alterHealth(self, dHealth):
         GameObject.alterHealth(self, dHealth)
@@ -339,22 +499,17 @@ class Player(GameObject):
         self.hurtSound.play()
 
     def updateHealthUI(self):
-        for index, icon in enumerate(self.healthIcons):
-            if index < self.health:
-                icon.show()
-            else:
-                icon.hide()
+        # One icon for each point of health, or part thereof
+        count = min(max(math.ceil(self.health), 0), int(self.maxHealth))
+        self.healthBar.setCount(count)
 
     def cleanup(self):
         self.scoreUI.removeNode()
 
-        for icon in self.healthIcons:
-            icon.removeNode()
+        self.healthBar.removeNode()
 
         self.beamHitModel.removeNode()
 
-        base.cTrav.removeCollider(self.rayNodePath)
-
         self.laserSoundHit.stop()
         self.laserSoundNoHit.stop()
 
@@ -364,33 +519,49 @@ class Player(GameObject):
         GameObject.cleanup(self)
 
 class Enemy(GameObject):
+    __slots__ = ("deathTask",)
+
     def __init__(self, pos, modelName, modelAnims, maxHealth, maxSpeed, colliderName):
         GameObject.__init__(self, pos, modelName, modelAnims, maxHealth, maxSpeed, colliderName)
 
-        self.scoreValue = 1
+        self.world.scoreValues.add(self.entity, value = 1)
 
-    def update(self, player, dt):
-        GameObject.update(self, dt)
+        # The pending task that'll put us away once our
+        # death-animation is done, if we're dying
+        self.deathTask = None
+
+    @property
+    def scoreValue(self):
+        return self.world.scoreValues.get(self.entity, "value")
 
+    @scoreValue.setter
+    def scoreValue(self, value):
+        self.world.scoreValues.set(self.entity, "value", value)
+
+    # Our movement is handled by the game's movement-system;
+    # here we just decide where we want to go
+    def update(self, player, dt):
         self.runLogic(player, dt)
 
+        self.updateAnimation()
+
+    def updateAnimation(self):
+        animState = self.animState
         if self.walking:
-            walkingControl = self.actor.getAnimControl("walk")
-            if not walkingControl.isPlaying():
-                self.actor.loop("walk")
-        else:
-            spawnControl = self.actor.getAnimControl("spawn")
-            if spawnControl is None or not spawnControl.isPlaying():
-                attackControl = self.actor.getAnimControl("attack")
-                if attackControl is None or not attackControl.isPlaying():
-                    standControl = self.actor.getAnimControl("stand")
-                    if not standControl.isPlaying():
-                        self.actor.loop("stand")
+            animState.request("walk")
+        elif not animState.isPlaying("spawn") and not animState.isPlaying("attack"):
+            animState.request("stand")
 
     def runLogic(self, player, dt):
         pass
 
 class WalkingEnemy(Enemy):
+    contactCategory = CONTACT_WALKING_ENEMY
+
+    __slots__ = ("attackDistance", "attackDelay", "attackDelayTimer", "attackWaitTimer",
+                 "attackDamage", "attackMask", "attackSound",
+                 "yVector", "hordeIndex")
+
     def __init__(self, pos):
         Enemy.__init__(self, pos,
                        "Models/Misc/simpleEnemy",
@@ -415,41 +586,36 @@ class WalkingEnemy(Enemy):
         mask.setBit(2)
 
         self.collider.node().setIntoCollideMask(mask)
+        self.intoMask = mask.getWord()
 
-        self.attackSegment = CollisionSegment(0, 0, 0, 1, 0, 0)
-
-        segmentNode = CollisionNode("enemyAttackSegment")
-        segmentNode.addSolid(self.attackSegment)
-
+        # Our attacks hit the same things that an attack-segment
+        # with this "from" mask would, but are checked against
+        # the game's spatial hash, rather than traversed
         mask = BitMask32()
         mask.setBit(1)
 
-        segmentNode.setFromCollideMask(mask)
-
-        mask = BitMask32()
-
-        segmentNode.setIntoCollideMask(mask)
-
-        self.attackSegmentNodePath = render.attachNewNode(segmentNode)
-        self.segmentQueue = CollisionHandlerQueue()
-
-        base.cTrav.addCollider(self.attackSegmentNodePath, self.segmentQueue)
+        self.attackMask = mask.getWord()
 
         self.attackDamage = -1
 
-        self.deathSound = loader.loadSfx("Sounds/enemyDie.ogg")
-        self.attackSound = loader.loadSfx("Sounds/enemyAttack.ogg")
+        # Our index in the HordeSteering arrays, if we're
+        # being updated that way
+        self.hordeIndex = -1
+
+        self.deathSound = base.sfxManager.getSound("Sounds/enemyDie.ogg")
+        self.attackSound = base.sfxManager.getSound("Sounds/enemyAttack.ogg")
 
         self.yVector = Vec2(0, 1)
 
-        self.actor.play("spawn")
+        self.animState.addListener(self.animationChanged)
+
+        self.animState.request("spawn", loop = False)
 
     def runLogic(self, player, dt):
-        spawnControl = self.actor.getAnimControl("spawn")
-        if spawnControl is not None and spawnControl.isPlaying():
+        if self.animState.isPlaying("spawn"):
             return
 
-        vectorToPlayer = player.actor.getPos() - self.actor.getPos()
+        vectorToPlayer = player.position - self.position
 
         vectorToPlayer2D = vectorToPlayer.getXy()
         distanceToPlayer = vectorToPlayer2D.length()
@@ -458,43 +624,48 @@ class WalkingEnemy(Enemy):
 
         heading = self.yVector.signedAngleDeg(vectorToPlayer2D)
 
-        self.attackSegment.setPointA(self.actor.getPos())
-        self.attackSegment.setPointB(self.actor.getPos() + self.actor.getQuat().getForward()*self.attackDistance)
-
         if distanceToPlayer > self.attackDistance*0.9:
-            attackControl = self.actor.getAnimControl("attack")
-            if not attackControl.isPlaying():
+            if not self.animState.isPlaying("attack"):
                 self.walking = True
                 vectorToPlayer.setZ(0)
                 vectorToPlayer.normalize()
-                self.velocity += vectorToPlayer*self.acceleration*dt
+                self.accelerate(vectorToPlayer.x*self.acceleration*dt,
+                                vectorToPlayer.y*self.acceleration*dt)
                 self.attackWaitTimer = 0.2
                 self.attackDelayTimer = 0
         else:
             self.walking = False
-            self.velocity.set(0, 0, 0)
+            self.setVelocity(0, 0)
 
             if self.attackDelayTimer > 0:
                 self.attackDelayTimer -= dt
                 if self.attackDelayTimer <= 0:
-                    if self.segmentQueue.getNumEntries() > 0:
-                        self.segmentQueue.sortEntries()
-                        segmentHit = self.segmentQueue.getEntry(0)
-
-                        hitNodePath = segmentHit.getIntoNodePath()
-                        if hitNodePath.hasPythonTag("owner"):
-                            hitObject = hitNodePath.getPythonTag("owner")
-                            hitObject.alterHealth(self.attackDamage)
-                            self.attackWaitTimer = 1.0
+                    hitObject = self.findAttackTarget()
+                    if hitObject is not None:
+                        hitObject.alterHealth(self.attackDamage)
+                        self.attackWaitTimer = 1.0
             elif self.attackWaitTimer > 0:
                 self.attackWaitTimer -= dt
                 if self.attackWaitTimer <= 0:
                     self.attackWaitTimer = random.uniform(0.5, 0.7)
                     self.attackDelayTimer = self.attackDelay
-                    self.actor.play("attack")
-                    self.attackSound.play()
+                    self.animState.request("attack", loop = False)
 
-        self.actor.setH(heading)
+        self.setHeading(heading)
+
+    def animationChanged(self, previousState, newState):
+        if newState == "attack":
+            self.attackSound.play()
+
+    def findAttackTarget(self):
+        pos = self.position
+        forward = self.actor.getQuat().getForward()
+        hitObject, hitFraction = base.spatialHash.castSegment(pos.x, pos.y,
+                                                              pos.x + forward.x*self.attackDistance,
+                                                              pos.y + forward.y*self.attackDistance,
+                                                              self.attackMask,
+                                                              self)
+        return hitObject
 
     def alterHealth(self, dHealth):
         Enemy.alterHealth(self, dHealth)
@@ -506,13 +677,20 @@ class WalkingEnemy(Enemy):
             perc = 0
         self.actor.setColorScale(perc, perc, perc, 1)
 
-    def cleanup(self):
-        base.cTrav.removeCollider(self.attackSegmentNodePath)
-        self.attackSegmentNodePath.removeNode()
+    def activate(self, pos):
+        Enemy.activate(self, pos)
 
-        GameObject.cleanup(self)
+        self.attackDelayTimer = 0
+        self.attackWaitTimer = 0
+
+        self.animState.request("spawn", loop = False)
 
 class TrapEnemy(Enemy):
+    contactCategory = CONTACT_TRAP_ENEMY
+
+    __slots__ = ("moveInX", "moveDirection", "ignorePlayer",
+                 "impactSound", "stopSound", "movementSound")
+
     def __init__(self, pos):
         Enemy.__init__(self, pos,
                        "Models/Misc/trap",
@@ -524,20 +702,36 @@ class TrapEnemy(Enemy):
                        10.0,
                        "trapEnemy")
 
+        # Bit 3 is ours alone, so that other traps can be told apart
         mask = BitMask32()
+        mask.setBit(3)
         mask.setBit(2)
         mask.setBit(1)
 
         self.collider.node().setIntoCollideMask(mask)
+        self.intoMask = mask.getWord()
 
+        # We're not traversed--our contacts are found by the game's
+        # SweptMovementSystem and ContactDispatcher--so this is just
+        # what we touch: the player, enemies, and other traps
         mask = BitMask32()
+        mask.setBit(3)
         mask.setBit(2)
         mask.setBit(1)
 
-        self.collider.node().setFromCollideMask(mask)
+        self.fromMask = mask.getWord()
 
-        base.pusher.addCollider(self.collider, self.actor)
-        base.cTrav.addCollider(self.collider, base.pusher)
+        # Only other traps stop us; we slide through the rest
+        mask = BitMask32()
+        mask.setBit(3)
+
+        self.blockMask = mask.getWord()
+
+        base.arenaBounds.add(self)
+
+        # We move quickly, so we're swept along our movement by
+        # the game's SweptMovementSystem, rather than simply stepped
+        self.world.velocities.set(self.entity, "swept", 1)
 
         self.moveInX = False
 
@@ -545,31 +739,31 @@ class TrapEnemy(Enemy):
 
         self.ignorePlayer = False
 
-        self.impactSound = loader.loadSfx("Sounds/trapHitsSomething.ogg")
-        self.stopSound = loader.loadSfx("Sounds/trapStop.ogg")
-        self.movementSound = loader.loadSfx("Sounds/trapSlide.ogg")
+        self.impactSound = base.sfxManager.getSound("Sounds/trapHitsSomething.ogg")
+        self.stopSound = base.sfxManager.getSound("Sounds/trapStop.ogg")
+        self.movementSound = base.sfxManager.getSound("Sounds/trapSlide.ogg")
         self.movementSound.setLoop(True)
 
     def runLogic(self, player, dt):
         if self.moveDirection != 0:
             self.walking = True
             if self.moveInX:
-                self.velocity.addX(self.moveDirection*self.acceleration*dt)
+                self.accelerate(self.moveDirection*self.acceleration*dt, 0)
             else:
-                self.velocity.addY(self.moveDirection*self.acceleration*dt)
+                self.accelerate(0, self.moveDirection*self.acceleration*dt)
         else:
             self.walking = False
-            diff = player.actor.getPos() - self.actor.getPos()
-            if self.moveInX:
-                detector = diff.y
-                movement = diff.x
-            else:
-                detector = diff.x
-                movement = diff.y
 
-            if abs(detector) < 0.5:
-                self.moveDirection = math.copysign(1, movement)
-                self.movementSound.play()
+    # Called by the game's TrapLanes when the player
+    # comes into our lane
+    def startMoving(self, player):
+        if self.moveInX:
+            movement = player.position.x - self.position.x
+        else:
+            movement = player.position.y - self.position.y
+
+        self.moveDirection = math.copysign(1, movement)
+        self.movementSound.play()
 
     def alterHealth(self, dHealth):
         pass
@@ -0,0 +1,56 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+from panda3d.core import CardMaker, SamplerState, TextureStage
+
+# A row of health-icons, drawn as a single card.
+#
+# Rather than having a separate image for each icon, we have one
+# card with the icon-texture set to repeat. To show a given number
+# of icons, the card is stretched to that many icons' width, and
+# its texture-coordinates are scaled to match--so however many
+# icons there are, it's still just one node and one draw-call.
+class HealthBar():
+    # "pos" is the centre of the first icon; "spacing" is the
+    # distance between the centres of neighbouring icons
+    def __init__(self, imageFile, count, pos, spacing, iconScale, parent = None):
+        if parent is None:
+            parent = aspect2d
+
+        texture = loader.loadTexture(imageFile)
+        texture.setWrapU(SamplerState.WMRepeat)
+
+        cardMaker = CardMaker("healthBar")
+        cardMaker.setFrame(0, spacing, -iconScale, iconScale)
+
+        self.root = parent.attachNewNode(cardMaker.generate())
+        self.root.setTexture(texture)
+        self.root.setTransparency(True)
+        self.root.setPos(pos[0] - spacing*0.5, 0, pos[2])
+
+        self.count = None
+        self.setCount(count)
+
+    def setCount(self, count):
+        if count == self.count:
+            return
+        self.count = count
+
+        if count <= 0:
+            self.root.hide()
+            return
+
+        self.root.show()
+        self.root.setSx(count)
+        self.root.setTexScale(TextureStage.getDefault(), count, 1)
+
+    def removeNode(self):
+        self.root.removeNode()
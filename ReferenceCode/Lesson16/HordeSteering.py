@@ -0,0 +1,228 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+from GameObject import FRICTION
+
+import random
+
+# NumPy is optional: without it, the game simply falls back
+# to updating each enemy individually
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Runs the movement-logic of a whole crowd of WalkingEnemies at once.
+#
+# Rather than having each enemy work out its own movement, their
+# positions, velocities, headings and timers are kept here, packed
+# into arrays, and updated for all enemies in a single pass. The
+# enemies' NodePaths are then just handed the results.
+#
+# The active enemies are always kept in the first "count"
+# entries of the arrays; each enemy knows its own index.
+class HordeSteering():
+    @staticmethod
+    def isAvailable():
+        return numpy is not None
+
+    def __init__(self, capacity = 32):
+        self.enemies = []
+        self.count = 0
+
+        self.positions = numpy.zeros((capacity, 2))
+        self.velocities = numpy.zeros((capacity, 2))
+        self.headings = numpy.zeros(capacity)
+        self.walking = numpy.zeros(capacity, dtype = bool)
+
+        self.attackDelayTimers = numpy.zeros(capacity)
+        self.attackWaitTimers = numpy.zeros(capacity)
+        # How much longer the "spawn" and "attack" animations will
+        # run for--this saves us from asking the Actors every frame
+        self.spawnTimers = numpy.zeros(capacity)
+        self.attackAnimTimers = numpy.zeros(capacity)
+
+        # These are the same for every enemy in the horde, and so
+        # are taken from the first one that we're given
+        self.maxSpeed = None
+        self.acceleration = None
+        self.attackDistance = None
+        self.attackDelay = None
+        self.spawnDuration = None
+        self.attackDuration = None
+
+    def grow(self):
+        # An empty crowd has nothing to double
+        capacity = max(1, len(self.headings)*2)
+        for name in ("positions", "velocities", "headings", "walking",
+                     "attackDelayTimers", "attackWaitTimers",
+                     "spawnTimers", "attackAnimTimers"):
+            oldArray = getattr(self, name)
+            newShape = (capacity,) + oldArray.shape[1:]
+            newArray = numpy.zeros(newShape, dtype = oldArray.dtype)
+            newArray[:self.count] = oldArray[:self.count]
+            setattr(self, name, newArray)
+
+    def add(self, enemy):
+        if self.maxSpeed is None:
+            self.maxSpeed = enemy.maxSpeed
+            self.acceleration = enemy.acceleration
+            self.attackDistance = enemy.attackDistance
+            self.attackDelay = enemy.attackDelay
+            self.spawnDuration = enemy.animState.getDuration("spawn")
+            self.attackDuration = enemy.animState.getDuration("attack")
+
+        if self.count >= len(self.headings):
+            self.grow()
+
+        index = self.count
+        self.count += 1
+
+        pos = enemy.position
+        self.positions[index] = (pos.x, pos.y)
+        self.velocities[index] = enemy.getVelocity()
+        self.headings[index] = enemy.actor.getH()
+        self.walking[index] = enemy.walking
+        self.attackDelayTimers[index] = enemy.attackDelayTimer
+        self.attackWaitTimers[index] = enemy.attackWaitTimer
+        self.spawnTimers[index] = self.spawnDuration
+        self.attackAnimTimers[index] = 0
+
+        enemy.hordeIndex = index
+        self.enemies.append(enemy)
+
+        # We move this one from now on, not the movement-system
+        enemy.disableMovement()
+
+    def remove(self, enemy):
+        index = enemy.hordeIndex
+        last = self.count - 1
+
+        # Keep the arrays packed by moving the last enemy
+        # into the gap left by the removed one
+        if index != last:
+            for array in (self.positions, self.velocities, self.headings, self.walking,
+                          self.attackDelayTimers, self.attackWaitTimers,
+                          self.spawnTimers, self.attackAnimTimers):
+                array[index] = array[last]
+            movedEnemy = self.enemies[last]
+            movedEnemy.hordeIndex = index
+            self.enemies[index] = movedEnemy
+
+        self.enemies.pop()
+        self.count -= 1
+
+        enemy.hordeIndex = -1
+
+    def clear(self):
+        for enemy in self.enemies:
+            enemy.hordeIndex = -1
+        self.enemies = []
+        self.count = 0
+
+    def update(self, player, dt):
+        count = self.count
+        if count == 0:
+            return
+
+        positions = self.positions[:count]
+        velocities = self.velocities[:count]
+        walking = self.walking[:count]
+        attackDelayTimers = self.attackDelayTimers[:count]
+        attackWaitTimers = self.attackWaitTimers[:count]
+        spawnTimers = self.spawnTimers[:count]
+        attackAnimTimers = self.attackAnimTimers[:count]
+
+        # Clamp the speed, apply friction, and move, as
+        # GameObject.update does for a single object
+        speeds = numpy.hypot(velocities[:, 0], velocities[:, 1])
+        tooFast = speeds > self.maxSpeed
+        velocities[tooFast] *= (self.maxSpeed/speeds[tooFast])[:, None]
+        numpy.minimum(speeds, self.maxSpeed, out = speeds)
+
+        frictionVal = FRICTION*dt
+        stopping = ~walking & (speeds <= frictionVal)
+        slowing = ~walking & ~stopping
+        velocities[stopping] = 0
+        velocities[slowing] *= (1.0 - frictionVal/speeds[slowing])[:, None]
+
+        positions += velocities*dt
+
+        spawnTimers -= dt
+        attackAnimTimers -= dt
+
+        # Now the logic from WalkingEnemy.runLogic
+        playerPos = player.position
+        toPlayer = numpy.array((playerPos.x, playerPos.y)) - positions
+        distances = numpy.hypot(toPlayer[:, 0], toPlayer[:, 1])
+        directions = toPlayer/numpy.maximum(distances, 0.0001)[:, None]
+
+        # Enemies that are still spawning don't do anything else
+        ready = spawnTimers <= 0
+
+        # This is the same as Vec2(0, 1).signedAngleDeg(direction)
+        headings = numpy.degrees(numpy.arctan2(-directions[:, 0], directions[:, 1]))
+        self.headings[:count][ready] = headings[ready]
+
+        far = ready & (distances > self.attackDistance*0.9)
+        chasing = far & (attackAnimTimers <= 0)
+        walking[chasing] = True
+        velocities[chasing] += directions[chasing]*(self.acceleration*dt)
+        attackWaitTimers[chasing] = 0.2
+        attackDelayTimers[chasing] = 0
+
+        near = ready & ~far
+        walking[near] = False
+        velocities[near] = 0
+
+        delaying = near & (attackDelayTimers > 0)
+        attackDelayTimers[delaying] -= dt
+        striking = delaying & (attackDelayTimers <= 0)
+
+        waiting = near & ~delaying & (attackWaitTimers > 0)
+        attackWaitTimers[waiting] -= dt
+        windingUp = waiting & (attackWaitTimers <= 0)
+
+        for index in numpy.flatnonzero(windingUp):
+            enemy = self.enemies[index]
+            attackWaitTimers[index] = random.uniform(0.5, 0.7)
+            attackDelayTimers[index] = self.attackDelay
+            attackAnimTimers[index] = self.attackDuration
+            enemy.animState.request("attack", loop = False)
+
+        if striking.any():
+            # Attacks reach from the enemy, along its facing,
+            # out to its attack-distance
+            headingRadians = numpy.radians(self.headings[:count])
+            reachX = -numpy.sin(headingRadians)*self.attackDistance
+            reachY = numpy.cos(headingRadians)*self.attackDistance
+            spatialHash = base.spatialHash
+            for index in numpy.flatnonzero(striking):
+                enemy = self.enemies[index]
+                x = positions[index, 0]
+                y = positions[index, 1]
+                hitObject, hitFraction = spatialHash.castSegment(x, y,
+                                                                 x + reachX[index],
+                                                                 y + reachY[index],
+                                                                 enemy.attackMask,
+                                                                 enemy)
+                if hitObject is not None:
+                    hitObject.alterHealth(enemy.attackDamage)
+                    attackWaitTimers[index] = 1.0
+
+        # Finally, hand the results over to the scene-graph
+        headings = self.headings
+        for index, enemy in enumerate(self.enemies):
+            x = positions[index, 0]
+            y = positions[index, 1]
+            enemy.placeAt(x, y, headings[index])
+            enemy.walking = bool(walking[index])
+            enemy.updateAnimation()
@@ -0,0 +1,148 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+from panda3d.core import TextNode, NodePath
+from direct.gui.OnscreenText import OnscreenText
+
+# Text on the HUD, updated at most once per frame.
+#
+# Changing the text of a TextNode has it rebuild its geometry,
+# which isn't cheap--and the game may well change the same
+# piece of text several times in a frame. So the elements here
+# just note what they should show, and mark themselves "dirty";
+# once per frame--after the game has updated, but before the
+# frame is drawn--the layer brings the dirty ones up to date.
+class HudTextLayer():
+    def __init__(self):
+        self.dirtyElements = []
+
+        self.flushTask = taskMgr.add(self.flush, "hudTextFlush", sort = 45)
+
+    def markDirty(self, element):
+        if not element.dirty:
+            element.dirty = True
+            self.dirtyElements.append(element)
+
+    def forget(self, element):
+        if element.dirty:
+            element.dirty = False
+            self.dirtyElements.remove(element)
+
+    def flush(self, task = None):
+        for element in self.dirtyElements:
+            element.dirty = False
+            element.apply()
+        self.dirtyElements = []
+
+        if task is not None:
+            return task.cont
+
+    def cleanup(self):
+        taskMgr.remove(self.flushTask)
+        self.dirtyElements = []
+
+# Wraps an OnscreenText or a DirectGUI-item, such as a DirectLabel
+class HudText():
+    def __init__(self, layer, widget):
+        self.layer = layer
+        self.widget = widget
+        self.dirty = False
+
+        if isinstance(widget, OnscreenText):
+            self.text = widget.getText()
+        else:
+            self.text = widget["text"]
+
+    def setText(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        self.layer.markDirty(self)
+
+    def apply(self):
+        if isinstance(self.widget, OnscreenText):
+            self.widget.setText(self.text)
+        else:
+            # Setting the option has the item rebuild its text
+            self.widget["text"] = self.text
+
+    def removeNode(self):
+        self.layer.forget(self)
+        self.widget.removeNode()
+
+# A number on the HUD, such as the score.
+#
+# Rather than having a TextNode rebuild its text each time that
+# the number changes, each digit is generated just once, up front.
+# The number is then shown by placing instances of those digits,
+# one per place; when the number changes, only the places whose
+# digits have changed are touched.
+class DigitCounter():
+    def __init__(self, layer, font, value = 0,
+                 pos = (0, 0), scale = 0.07, fg = (0, 0, 0, 1), parent = None):
+        if parent is None:
+            parent = aspect2d
+
+        self.layer = layer
+        self.dirty = False
+
+        self.root = parent.attachNewNode("digitCounter")
+        self.root.setPos(pos[0], 0, pos[1])
+        self.root.setScale(scale)
+
+        textNode = TextNode("digit")
+        textNode.setFont(font)
+        textNode.setTextColor(*fg)
+
+        self.glyphs = {}
+        self.advances = {}
+        for digit in "-0123456789":
+            textNode.setText(digit)
+            self.glyphs[digit] = NodePath(textNode.generate())
+            self.advances[digit] = textNode.calcWidth(digit)
+
+        # The node for each place, and the digit that it shows
+        self.places = []
+        self.placeDigits = []
+
+        self.value = value
+        self.apply()
+
+    def setValue(self, value):
+        if value == self.value:
+            return
+        self.value = value
+        self.layer.markDirty(self)
+
+    def apply(self):
+        text = str(self.value)
+
+        while len(self.places) < len(text):
+            self.places.append(self.root.attachNewNode("place"))
+            self.placeDigits.append(None)
+
+        x = 0
+        for index, digit in enumerate(text):
+            place = self.places[index]
+            if self.placeDigits[index] != digit:
+                place.getChildren().detach()
+                self.glyphs[digit].instanceTo(place)
+                self.placeDigits[index] = digit
+            place.setX(x)
+            place.show()
+            x += self.advances[digit]
+
+        for place in self.places[len(text):]:
+            place.hide()
+
+    def removeNode(self):
+        self.layer.forget(self)
+        self.root.removeNode()
@@ -0,0 +1,109 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+from panda3d.core import Point3, loadPrcFileData
+
+import struct
+
+# A recording is a small header--holding the random seed, the
+# tick-rate that the game was run at, and the settings that change
+# how the game plays out--followed by one fixed-size record per
+# tick. Each record holds the controls that were held, packed
+# into bits, and the point on the ground that the player was
+# aiming at.
+#
+# The settings are kept as the lines of a configuration-page--such
+# as "game-max-enemies 50"--and are loaded as such when the
+# recording is replayed, overriding whatever was given this time.
+#
+# Storing the aim-point, rather than the raw mouse-position,
+# means that a replay doesn't depend on the size or shape of
+# the window that the recording was made in.
+
+MAGIC = b"PCIR"
+VERSION = 2
+
+# The last field is the length of the settings that follow
+HEADER_FORMAT = struct.Struct("<4sHIfH")
+TICK_FORMAT = struct.Struct("<Bff")
+
+KEY_ORDER = ("up", "down", "left", "right", "shoot")
+
+class InputRecorder():
+    # "settings" maps the names of configuration-variables
+    # to their values, as they'd be written in a .prc-file
+    def __init__(self, fileName, seed, tickRate, settings):
+        settingsData = "".join("{0} {1}\n".format(name, value)
+                               for name, value in sorted(settings.items())).encode("utf-8")
+
+        self.file = open(fileName, "wb")
+        self.file.write(HEADER_FORMAT.pack(MAGIC, VERSION, seed, tickRate, len(settingsData)))
+        self.file.write(settingsData)
+
+        self.numTicks = 0
+
+    def recordTick(self, keys, aimPoint):
+        keyBits = 0
+        for bit, keyName in enumerate(KEY_ORDER):
+            if keys[keyName]:
+                keyBits |= 1 << bit
+
+        self.file.write(TICK_FORMAT.pack(keyBits, aimPoint.x, aimPoint.y))
+        self.numTicks += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class InputPlayback():
+    def __init__(self, fileName):
+        with open(fileName, "rb") as inputFile:
+            data = inputFile.read()
+
+        magic, version, self.seed, self.tickRate, settingsLength = HEADER_FORMAT.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("\"{0}\" isn't a version-{1} input-recording".format(fileName, VERSION))
+
+        settingsStart = HEADER_FORMAT.size
+        self.settingsText = data[settingsStart:settingsStart + settingsLength].decode("utf-8")
+        self.settings = {}
+        for line in self.settingsText.splitlines():
+            name, value = line.split(" ", 1)
+            self.settings[name] = value
+
+        self.data = data
+        self.offset = settingsStart + settingsLength
+        self.numTicks = (len(data) - self.offset)//TICK_FORMAT.size
+
+        self.keys = {keyName : False for keyName in KEY_ORDER}
+        self.aimPoint = Point3(0, 0, 0)
+
+    # Loads the settings that the recording was made with; this
+    # should be done before the game reads any of them
+    def applySettings(self):
+        if self.settingsText != "":
+            loadPrcFileData("input-recording", self.settingsText)
+
+    def isFinished(self):
+        return self.offset + TICK_FORMAT.size > len(self.data)
+
+    # Returns the controls and aim-point for the next tick. Note
+    # that the same dictionary and point are re-used each time.
+    def readTick(self):
+        keyBits, aimX, aimY = TICK_FORMAT.unpack_from(self.data, self.offset)
+        self.offset += TICK_FORMAT.size
+
+        for bit, keyName in enumerate(KEY_ORDER):
+            self.keys[keyName] = (keyBits & (1 << bit)) != 0
+        self.aimPoint.set(aimX, aimY, 0)
+
+        return self.keys, self.aimPoint
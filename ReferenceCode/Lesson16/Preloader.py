@@ -0,0 +1,110 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+# Loads models and sounds in the background.
+#
+# Each file is requested from Panda's asynchronous loader, which
+# reads and prepares it on a thread of its own, and calls us back
+# once it's done--so the main thread (and thus the title-menu)
+# carries on as usual in the meantime.
+#
+# Models end up in Panda's model-pool, so a later, ordinary call
+# to "loadModel"--or the building of an Actor--gets them from
+# there, rather than from disk. Models that the AssetCache has yet
+# to convert are loaded from their .egg-files, and handed to it to
+# be converted once they arrive, so that the parsing happens in the
+# background, too. Sounds are handed over to the SfxManager, to be
+# used as voices.
+#
+# Listeners are called with the number of files loaded so far,
+# and the total number of files, each time that a file arrives.
+class Preloader():
+    def __init__(self, loader, sfxManager, assetCache):
+        self.loader = loader
+        self.sfxManager = sfxManager
+        self.assetCache = assetCache
+
+        self.requests = []
+        self.models = {}
+
+        self.numLoaded = 0
+        self.total = 0
+
+        self.listeners = []
+
+    def addListener(self, listener):
+        self.listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def start(self, modelNames, soundNames):
+        self.total += len(modelNames) + len(soundNames)
+
+        for modelName in modelNames:
+            loadName, needsStoring = self.assetCache.prepare(modelName)
+            request = self.loader.loadModel(loadName,
+                                            callback = self.modelLoaded,
+                                            extraArgs = [modelName, needsStoring])
+            self.requests.append(request)
+
+        for soundName in soundNames:
+            request = self.loader.loadSfx(soundName,
+                                          callback = self.soundLoaded,
+                                          extraArgs = [soundName])
+            self.requests.append(request)
+
+        # Nothing to load, so we're already done
+        if self.total == 0:
+            self.notify()
+
+    def modelLoaded(self, model, modelName, needsStoring):
+        # A model that failed to load comes back as None; it'll
+        # simply be loaded--and complained about--when it's used
+        if model is not None:
+            if needsStoring:
+                self.assetCache.store(modelName, model)
+            self.models[modelName] = model
+        self.fileLoaded()
+
+    def soundLoaded(self, sound, soundName):
+        if sound is not None:
+            self.sfxManager.addVoice(soundName, sound)
+        self.fileLoaded()
+
+    def fileLoaded(self):
+        self.numLoaded += 1
+        if self.isDone():
+            self.requests = []
+        self.notify()
+
+    def notify(self):
+        for listener in list(self.listeners):
+            listener(self.numLoaded, self.total)
+
+    def getProgress(self):
+        if self.total == 0:
+            return 1.0
+        return self.numLoaded/self.total
+
+    def isDone(self):
+        return self.numLoaded >= self.total
+
+    def cancel(self):
+        for request in self.requests:
+            self.loader.cancelRequest(request)
+        self.requests = []
+        self.listeners = []
+
+    def cleanup(self):
+        self.cancel()
+        self.models = {}
@@ -0,0 +1,180 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+from panda3d.core import AudioSound
+
+# A single playing instance of a sound-file, along with
+# the SoundEffect that's currently using it
+class SfxVoice():
+    def __init__(self, sound):
+        self.sound = sound
+        self.owner = None
+
+# All of the voices for a single sound-file. These are kept
+# in the order in which they were last started, so that the
+# first one is the one that we'd steal if we had to.
+class SfxVoiceGroup():
+    def __init__(self, manager, fileName, polyphony):
+        self.manager = manager
+        self.fileName = fileName
+        self.polyphony = polyphony
+
+        self.voices = []
+
+    def acquire(self, owner):
+        voice = None
+        for candidate in self.voices:
+            if candidate.sound.status() != AudioSound.PLAYING:
+                voice = candidate
+                break
+
+        if voice is None:
+            if len(self.voices) < self.polyphony and self.manager.reserveVoice(self):
+                voice = SfxVoice(loader.loadSfx(self.fileName))
+                self.voices.append(voice)
+            elif len(self.voices) > 0:
+                voice = self.voices[0]
+            else:
+                return None
+
+        if voice.owner is not None and voice.owner is not owner:
+            voice.owner.voice = None
+        voice.owner = owner
+
+        voice.sound.stop()
+        voice.sound.setLoop(owner.loop)
+
+        self.touch(voice)
+
+        return voice
+
+    def touch(self, voice):
+        self.voices.remove(voice)
+        self.voices.append(voice)
+
+    def dropOldestVoice(self):
+        voice = self.voices.pop(0)
+        voice.sound.stop()
+        if voice.owner is not None:
+            voice.owner.voice = None
+        return voice
+
+    def cleanup(self):
+        while len(self.voices) > 0:
+            self.dropOldestVoice()
+
+# A stand-in for an AudioSound, handed out to each object
+# that wants to play a given sound. It only holds on to
+# a real voice while it's using one.
+class SoundEffect():
+    def __init__(self, group):
+        self.group = group
+        self.voice = None
+        self.loop = False
+
+    def setLoop(self, loop):
+        self.loop = loop
+        if self.voice is not None:
+            self.voice.sound.setLoop(loop)
+
+    def play(self):
+        if self.voice is None:
+            self.voice = self.group.acquire(self)
+            if self.voice is None:
+                return
+        else:
+            self.group.touch(self.voice)
+        self.voice.sound.play()
+
+    def stop(self):
+        if self.voice is not None:
+            self.voice.sound.stop()
+
+    def status(self):
+        if self.voice is None:
+            return AudioSound.READY
+        return self.voice.sound.status()
+
+class SfxManager():
+    def __init__(self, maxVoices = 32, defaultPolyphony = 4):
+        self.maxVoices = maxVoices
+        self.defaultPolyphony = defaultPolyphony
+
+        self.numVoices = 0
+
+        self.groups = {}
+        self.polyphonyOverrides = {}
+
+        self.sharedSounds = {}
+
+    def setPolyphony(self, fileName, polyphony):
+        self.polyphonyOverrides[fileName] = polyphony
+        if fileName in self.groups:
+            self.groups[fileName].polyphony = polyphony
+
+    def getGroup(self, fileName):
+        group = self.groups.get(fileName, None)
+        if group is None:
+            polyphony = self.polyphonyOverrides.get(fileName, self.defaultPolyphony)
+            group = SfxVoiceGroup(self, fileName, polyphony)
+            self.groups[fileName] = group
+        return group
+
+    def getSound(self, fileName):
+        return SoundEffect(self.getGroup(fileName))
+
+    # Takes a sound that's already been loaded--by a Preloader,
+    # say--to be used as one of the given file's voices. Returns
+    # whether there was room for it.
+    def addVoice(self, fileName, sound):
+        group = self.getGroup(fileName)
+        if len(group.voices) < group.polyphony and self.reserveVoice(group):
+            # It's not playing, so it goes first in line to be used
+            group.voices.insert(0, SfxVoice(sound))
+            return True
+        return False
+
+    # For things like DirectGUI's click-sounds, which want a
+    # real AudioSound, and which never overlap themselves anyway
+    def getSharedSound(self, fileName):
+        sound = self.sharedSounds.get(fileName, None)
+        if sound is None:
+            sound = loader.loadSfx(fileName)
+            self.sharedSounds[fileName] = sound
+        return sound
+
+    def reserveVoice(self, requestingGroup):
+        if self.numVoices < self.maxVoices:
+            self.numVoices += 1
+            return True
+
+        # We're out of voices, so take one from whichever
+        # other sound is currently using the most of them
+        victim = None
+        for group in self.groups.values():
+            if group is requestingGroup or len(group.voices) == 0:
+                continue
+            if victim is None or len(group.voices) > len(victim.voices):
+                victim = group
+
+        if victim is None:
+            return False
+
+        victim.dropOldestVoice()
+        return True
+
+    def cleanup(self):
+        for group in self.groups.values():
+            group.cleanup()
+        self.numVoices = 0
+
+        for sound in self.sharedSounds.values():
+            sound.stop()
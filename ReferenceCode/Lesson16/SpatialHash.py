@@ -0,0 +1,317 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+import math
+
+# Checks whether a 2D segment--starting at (startX, startY) and
+# covering (dirX, dirY)--enters a circle. If it does, the
+# fraction of the way along the segment at which it does so
+# is returned; if it doesn't, None is returned.
+def segmentEntersCircle(startX, startY, dirX, dirY, centreX, centreY, radius):
+    offsetX = startX - centreX
+    offsetY = startY - centreY
+
+    c = offsetX*offsetX + offsetY*offsetY - radius*radius
+    if c <= 0:
+        # We started inside the circle
+        return 0
+
+    a = dirX*dirX + dirY*dirY
+    if a <= 0:
+        return None
+
+    b = offsetX*dirX + offsetY*dirY
+    if b >= 0:
+        # We're heading away from the circle
+        return None
+
+    discriminant = b*b - a*c
+    if discriminant < 0:
+        return None
+
+    t = (-b - math.sqrt(discriminant))/a
+    if t > 1:
+        return None
+    return t
+
+# A uniform grid laid over the arena, used to quickly find the
+# objects near a given point or segment.
+#
+# Objects are filed under the cell that holds their centre, and
+# carry a bit-mask--mirroring their "into" collide-mask--so
+# that queries can pick out just the sorts of objects that they
+# care about.
+#
+# The contents are expected to be rebuilt each update, via
+# "clear" and "insert"; objects that move partway through an
+# update can be re-filed with "update".
+class SpatialHash():
+    def __init__(self, minX, minY, size, cellSize):
+        self.minX = minX
+        self.minY = minY
+        self.cellSize = cellSize
+        self.cellsPerSide = int(math.ceil(size/cellSize))
+
+        self.cells = [[] for i in range(self.cellsPerSide*self.cellsPerSide)]
+        self.occupiedCells = []
+
+        # The index of the cell that each object is filed under
+        self.locations = {}
+
+        # The largest radius of anything that we've been given,
+        # which tells us how far beyond a query we have to look
+        self.maxRadius = 0
+
+    def getCellCoords(self, x, y):
+        cellX = int((x - self.minX)/self.cellSize)
+        cellY = int((y - self.minY)/self.cellSize)
+
+        # Anything outside of the grid is kept in the edge-cells
+        last = self.cellsPerSide - 1
+        if cellX < 0:
+            cellX = 0
+        elif cellX > last:
+            cellX = last
+        if cellY < 0:
+            cellY = 0
+        elif cellY > last:
+            cellY = last
+
+        return cellX, cellY
+
+    def clear(self):
+        cells = self.cells
+        for index in self.occupiedCells:
+            cells[index].clear()
+        self.occupiedCells = []
+        self.locations = {}
+
+    def insert(self, obj, x, y):
+        cellX, cellY = self.getCellCoords(x, y)
+        index = cellY*self.cellsPerSide + cellX
+
+        cell = self.cells[index]
+        if len(cell) == 0:
+            self.occupiedCells.append(index)
+        cell.append((obj, x, y, obj.colliderRadius, obj.intoMask))
+        self.locations[obj] = index
+
+        if obj.colliderRadius > self.maxRadius:
+            self.maxRadius = obj.colliderRadius
+
+    # Moves an already-inserted object to the given position
+    def update(self, obj, x, y):
+        index = self.locations.get(obj, None)
+        if index is not None:
+            cell = self.cells[index]
+            for entryIndex, entry in enumerate(cell):
+                if entry[0] is obj:
+                    del cell[entryIndex]
+                    break
+            # An emptied cell stays in "occupiedCells"; clearing it
+            # again when the hash is cleared does no harm
+        self.insert(obj, x, y)
+
+    # Yields the entries in all of the cells that overlap
+    # the given rectangle
+    def entriesInRect(self, minX, minY, maxX, maxY):
+        startX, startY = self.getCellCoords(minX, minY)
+        endX, endY = self.getCellCoords(maxX, maxY)
+
+        cells = self.cells
+        cellsPerSide = self.cellsPerSide
+        for cellY in range(startY, endY + 1):
+            rowStart = cellY*cellsPerSide
+            for cellX in range(startX, endX + 1):
+                yield from cells[rowStart + cellX]
+
+    # Returns all objects matching the mask whose colliders
+    # come within the given radius of the given point
+    def query(self, x, y, radius, mask):
+        reach = radius + self.maxRadius
+        results = []
+        for obj, objX, objY, objRadius, objMask in self.entriesInRect(x - reach, y - reach,
+                                                                      x + reach, y + reach):
+            if objMask & mask == 0:
+                continue
+            dx = objX - x
+            dy = objY - y
+            limit = radius + objRadius
+            if dx*dx + dy*dy <= limit*limit:
+                results.append(obj)
+        return results
+
+    # Returns the first object matching the mask that the
+    # given segment hits, along with the fraction of the
+    # way along the segment at which it was hit--or
+    # (None, None) if nothing was hit
+    def castSegment(self, startX, startY, endX, endY, mask, ignore = None):
+        dirX = endX - startX
+        dirY = endY - startY
+
+        reach = self.maxRadius
+        bestObj = None
+        bestT = None
+        for obj, objX, objY, objRadius, objMask in self.entriesInRect(min(startX, endX) - reach,
+                                                                      min(startY, endY) - reach,
+                                                                      max(startX, endX) + reach,
+                                                                      max(startY, endY) + reach):
+            if objMask & mask == 0 or obj is ignore:
+                continue
+            t = segmentEntersCircle(startX, startY, dirX, dirY, objX, objY, objRadius)
+            if t is not None and (bestT is None or t < bestT):
+                bestObj = obj
+                bestT = t
+
+        return bestObj, bestT
+
+    # Returns the nearest object matching the mask that a ray--starting
+    # at (startX, startY), heading along the unit-vector (dirX, dirY),
+    # and going no further than "maxDistance"--hits, along with the
+    # distance to it; or (None, None) if nothing was hit. Objects
+    # that are no longer alive--such as enemies that have been
+    # killed earlier in the tick--are passed through.
+    #
+    # Rather than look at every cell that the ray's bounds overlap, we
+    # walk through the cells that the ray passes through, nearest first.
+    # Since an object might overhang the cell that it's filed under, we
+    # look at each of those cells' neighbours too--which is enough as
+    # long as nothing is wider than a cell. Once we've found a hit nearer
+    # than the cell that we're about to move on to, nothing further
+    # along can beat it, and we stop.
+    def castRay(self, startX, startY, dirX, dirY, maxDistance, mask, ignore = None):
+        if dirX == 0 and dirY == 0:
+            return None, None
+
+        cellSize = self.cellSize
+        cellsPerSide = self.cellsPerSide
+        last = cellsPerSide - 1
+        cells = self.cells
+
+        cellX, cellY = self.getCellCoords(startX, startY)
+
+        # For each axis, the distance along the ray at which we next
+        # cross into a new cell, and the distance between crossings
+        if dirX > 0:
+            stepX = 1
+            nextX = (self.minX + (cellX + 1)*cellSize - startX)/dirX
+            deltaX = cellSize/dirX
+        elif dirX < 0:
+            stepX = -1
+            nextX = (self.minX + cellX*cellSize - startX)/dirX
+            deltaX = -cellSize/dirX
+        else:
+            stepX = 0
+            nextX = math.inf
+            deltaX = math.inf
+
+        if dirY > 0:
+            stepY = 1
+            nextY = (self.minY + (cellY + 1)*cellSize - startY)/dirY
+            deltaY = cellSize/dirY
+        elif dirY < 0:
+            stepY = -1
+            nextY = (self.minY + cellY*cellSize - startY)/dirY
+            deltaY = -cellSize/dirY
+        else:
+            stepY = 0
+            nextY = math.inf
+            deltaY = math.inf
+
+        segmentX = dirX*maxDistance
+        segmentY = dirY*maxDistance
+
+        checked = set()
+        bestObj = None
+        bestDistance = None
+        while True:
+            for neighbourY in range(max(cellY - 1, 0), min(cellY + 1, last) + 1):
+                rowStart = neighbourY*cellsPerSide
+                for neighbourX in range(max(cellX - 1, 0), min(cellX + 1, last) + 1):
+                    index = rowStart + neighbourX
+                    if index in checked:
+                        continue
+                    checked.add(index)
+
+                    for obj, objX, objY, objRadius, objMask in cells[index]:
+                        if objMask & mask == 0 or obj is ignore:
+                            continue
+                        t = segmentEntersCircle(startX, startY, segmentX, segmentY, objX, objY, objRadius)
+                        if t is not None and obj.isAlive():
+                            distance = t*maxDistance
+                            if bestDistance is None or distance < bestDistance:
+                                bestObj = obj
+                                bestDistance = distance
+
+            if nextX < nextY:
+                entryDistance = nextX
+                cellX += stepX
+                nextX += deltaX
+            else:
+                entryDistance = nextY
+                cellY += stepY
+                nextY += deltaY
+
+            if entryDistance > maxDistance or cellX < 0 or cellX > last or cellY < 0 or cellY > last:
+                break
+            if bestDistance is not None and bestDistance <= entryDistance:
+                break
+
+        return bestObj, bestDistance
+
+    # As "castSegment", but for a circle of the given radius moving
+    # along the segment. Objects that the circle starts out touching
+    # are only hit if it's moving towards them, so that something
+    # that has come to rest against another can still move away.
+    def sweepCircle(self, startX, startY, endX, endY, radius, mask, ignore = None):
+        dirX = endX - startX
+        dirY = endY - startY
+
+        reach = self.maxRadius + radius
+        bestObj = None
+        bestT = None
+        for obj, objX, objY, objRadius, objMask in self.entriesInRect(min(startX, endX) - reach,
+                                                                      min(startY, endY) - reach,
+                                                                      max(startX, endX) + reach,
+                                                                      max(startY, endY) + reach):
+            if objMask & mask == 0 or obj is ignore:
+                continue
+            t = segmentEntersCircle(startX, startY, dirX, dirY, objX, objY, objRadius + radius)
+            if t == 0 and (objX - startX)*dirX + (objY - startY)*dirY <= 0:
+                continue
+            if t is not None and (bestT is None or t < bestT):
+                bestObj = obj
+                bestT = t
+
+        return bestObj, bestT
+
+    # Returns all of the objects matching the mask that a circle
+    # of the given radius touches on its way along the segment.
+    # As in "sweepCircle", objects that the circle starts out
+    # touching only count if it's moving towards them.
+    def touchCircle(self, startX, startY, endX, endY, radius, mask, ignore = None):
+        dirX = endX - startX
+        dirY = endY - startY
+
+        reach = self.maxRadius + radius
+        results = []
+        for obj, objX, objY, objRadius, objMask in self.entriesInRect(min(startX, endX) - reach,
+                                                                      min(startY, endY) - reach,
+                                                                      max(startX, endX) + reach,
+                                                                      max(startY, endY) + reach):
+            if objMask & mask == 0 or obj is ignore:
+                continue
+            t = segmentEntersCircle(startX, startY, dirX, dirY, objX, objY, objRadius + radius)
+            if t == 0 and (objX - startX)*dirX + (objY - startY)*dirY <= 0:
+                continue
+            if t is not None:
+                results.append(obj)
+        return results
@@ -0,0 +1,189 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+import os, time, json
+
+# Note when we were first imported--which should be as early as
+# possible--so that our times can be given from there
+IMPORT_TIME = time.perf_counter()
+
+# How long this process had been running when we were imported, where
+# the system tells us; otherwise, zero. Only Linux is handled here.
+def getProcessAge():
+    try:
+        with open("/proc/self/stat") as statFile:
+            # The process-name may hold spaces, so skip past it
+            fields = statFile.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as uptimeFile:
+            uptime = float(uptimeFile.read().split()[0])
+        startTime = int(fields[19])/os.sysconf("SC_CLK_TCK")
+        return max(uptime - startTime, 0.0)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+PROCESS_START_TIME = IMPORT_TIME - getProcessAge()
+
+# Used in place of a span when tracing is off
+class NullSpan():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Span():
+    def __init__(self, trace, category, name):
+        self.trace = trace
+        self.category = category
+        self.name = name
+
+    def __enter__(self):
+        self.startTime = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.trace.record(self.category, self.name, self.startTime, time.perf_counter())
+        return False
+
+# Records where the time goes between the process starting and
+# the first frame of the title-menu being drawn.
+#
+# Spans of time are recorded by category and name--such as
+# ("widget", "startButton")--either explicitly, via "span", or,
+# for assets, by watching the loader's "load" methods.
+#
+# An asynchronous request returns at once, so for those we record
+# the time from the request to its arrival instead, under "async";
+# such loads don't hold up the title-menu.
+#
+# Actors load their models and animations through Panda's own
+# loader, not the one that we watch, so their loads only show up
+# within whatever span--such as an "actor" span--surrounds them.
+#
+# When tracing is off, "span" hands back a do-nothing span,
+# and nothing else is touched.
+class StartupTrace():
+    LOADER_METHODS = ("loadModel", "loadTexture", "loadFont", "loadSfx", "loadMusic")
+
+    NOTES = [
+        "Actor models and animations bypass the watched loader; they're only counted within \"actor\" spans",
+        "\"async\" entries ran in the background, from request to arrival, and didn't block startup"
+    ]
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+
+        self.events = []
+        self.totalTime = None
+
+        self.watchedLoader = None
+
+    def span(self, category, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, category, name)
+
+    def record(self, category, name, startTime, endTime):
+        # Anything after the report has been made is of no interest
+        if self.totalTime is not None:
+            return
+        self.events.append((category, name, startTime - PROCESS_START_TIME, endTime - startTime))
+
+    # Records the time taken by each asset that the loader loads,
+    # until the first frame has been drawn
+    def watchLoader(self, loader):
+        if not self.enabled:
+            return
+
+        self.watchedLoader = loader
+        for methodName in self.LOADER_METHODS:
+            method = getattr(loader, methodName)
+            setattr(loader, methodName, self.makeWatcher(methodName, method))
+
+    def makeWatcher(self, methodName, method):
+        def watcher(*args, **kwargs):
+            if len(args) > 0:
+                fileName = args[0]
+            else:
+                fileName = next(iter(kwargs.values()), "")
+            name = "{0}({1})".format(methodName, fileName)
+
+            startTime = time.perf_counter()
+
+            callback = kwargs.get("callback", None)
+            if callback is not None:
+                def tracedCallback(*callbackArgs):
+                    self.record("async", name, startTime, time.perf_counter())
+                    return callback(*callbackArgs)
+                kwargs["callback"] = tracedCallback
+                return method(*args, **kwargs)
+
+            result = method(*args, **kwargs)
+            self.record("asset", name, startTime, time.perf_counter())
+            return result
+        return watcher
+
+    def unwatchLoader(self):
+        if self.watchedLoader is None:
+            return
+        for methodName in self.LOADER_METHODS:
+            delattr(self.watchedLoader, methodName)
+        self.watchedLoader = None
+
+    # Calls "callback" with this trace once the first frame has been
+    # drawn--that is, after the first run of the frame-rendering task
+    def finishAfterFirstFrame(self, taskMgr, callback):
+        if not self.enabled:
+            return
+
+        def firstFrameDrawn(task):
+            self.finish()
+            callback(self)
+            return task.done
+
+        taskMgr.add(firstFrameDrawn, "startupTraceFirstFrame", sort = 60)
+
+    def finish(self):
+        self.unwatchLoader()
+        self.totalTime = time.perf_counter() - PROCESS_START_TIME
+
+    def getReport(self):
+        events = sorted(self.events, key = lambda event: event[2])
+        return {
+            "totalMs" : self.totalTime*1000.0 if self.totalTime is not None else None,
+            "importMs" : (IMPORT_TIME - PROCESS_START_TIME)*1000.0,
+            "notes" : self.NOTES,
+            "events" : [
+                {
+                    "category" : category,
+                    "name" : name,
+                    "startMs" : startTime*1000.0,
+                    "durationMs" : duration*1000.0
+                }
+                for category, name, startTime, duration in events
+            ]
+        }
+
+    def writeJson(self, fileName):
+        with open(fileName, "w") as outputFile:
+            json.dump(self.getReport(), outputFile, indent = 2)
+
+    def printSummary(self):
+        report = self.getReport()
+        print("Startup: {0:.1f} ms from process start to the first title frame".format(report["totalMs"]))
+        print("  {0:.1f} ms before the game's modules were imported".format(report["importMs"]))
+        print("{0:<8}{1:<56}{2:>10}{3:>10}".format("", "", "at ms", "took ms"))
+        for event in report["events"]:
+            print("{category:<8}{name:<56}{startMs:>10.1f}{durationMs:>10.1f}".format(**event))
+        for note in report["notes"]:
+            print("Note: " + note)
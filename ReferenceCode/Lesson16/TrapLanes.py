@@ -0,0 +1,90 @@
+#####################################################
+#                                                   #
+# Original code copyright (c) 2019 Ian Eborn.       #
+# http://thaumaturge-art.com                        #
+#                                                   #
+# Licensed under the MIT license.                   #
+# See "FinalGame/codeLicense".txt, or               #
+# https://opensource.org/licenses/MIT               #
+#                                                   #
+#####################################################
+
+import math
+
+# Finds the traps that the player has stepped in front of.
+#
+# A trap only ever slides along one axis, and is set off when the
+# player comes within a short distance of the line that it slides
+# along--its "lane". Traps that slide in x watch a row, and those
+# that slide in y watch a column.
+#
+# So rather than have every idle trap check the player's position
+# each frame, the traps are filed by the rows and columns that
+# they watch. We then only look at those filed under the player's
+# current row and column--however many traps there are.
+#
+# A trap is filed by where it was when it was added; traps are
+# re-added whenever they come to rest.
+class TrapLanes():
+    def __init__(self, detectionRange = 0.5, laneWidth = 0.5):
+        self.detectionRange = detectionRange
+        self.laneWidth = laneWidth
+
+        self.rows = {}
+        self.columns = {}
+
+        # The table and cells under which each trap is filed
+        self.filing = {}
+
+    def getLane(self, coord):
+        return math.floor(coord/self.laneWidth)
+
+    def add(self, trap):
+        self.remove(trap)
+
+        if trap.moveInX:
+            table = self.rows
+            coord = trap.position.y
+        else:
+            table = self.columns
+            coord = trap.position.x
+
+        # File the trap under every lane that its detection-range
+        # overlaps, so that a single lookup finds it
+        cells = range(self.getLane(coord - self.detectionRange),
+                      self.getLane(coord + self.detectionRange) + 1)
+        for cell in cells:
+            table.setdefault(cell, []).append(trap)
+
+        self.filing[trap] = (table, cells)
+
+    def remove(self, trap):
+        filing = self.filing.pop(trap, None)
+        if filing is None:
+            return
+
+        table, cells = filing
+        for cell in cells:
+            cellTraps = table[cell]
+            cellTraps.remove(trap)
+            if len(cellTraps) == 0:
+                del table[cell]
+
+    def clear(self):
+        self.rows = {}
+        self.columns = {}
+        self.filing = {}
+
+    # The idle traps that the given position sets off
+    def findTriggered(self, pos):
+        triggered = []
+
+        for trap in self.rows.get(self.getLane(pos.y), ()):
+            if trap.moveDirection == 0 and abs(pos.y - trap.position.y) < self.detectionRange:
+                triggered.append(trap)
+
+        for trap in self.columns.get(self.getLane(pos.x), ()):
+            if trap.moveDirection == 0 and abs(pos.x - trap.position.x) < self.detectionRange:
+                triggered.append(trap)
+
+        return triggered